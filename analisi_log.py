@@ -0,0 +1,153 @@
+# GABRYSCOLA - Analisi dei log di testo
+# Legge in streaming i log scritti da Briscola._log (BRISCOLA, INIZIO_PARTITA MANO_A, MANO_IA, GIOCA, PRENDE, FINALE),
+# una riga alla volta e tenendo in memoria solo la mano in corso. I file si distribuiscono su un pool di processi
+# e i conteggi si sommano in un riepilogo JSON. Partite troncate o abbandonate (senza FINALE) contano come incomplete:
+# le loro mani entrano nelle statistiche, il risultato no.
+# Uso: python analisi_log.py [FILE o CARTELLE ...] [--processi P] [-o riepilogo.json]
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from multiprocessing import Pool
+
+SEMI = "BSCD" # Stesso ordine di Mazzo._SEMI_ITALIANI
+VALORI = "A234567890"
+_FINALE = re.compile(r"FINALE (.+) (\d+) - (.+) (\d+)$")
+
+def eventi(righe):
+    """Traduce le righe di un log in (tipo, dati). Le righe vuote o di intestazione si saltano,
+    quelle non riconosciute danno ("?", riga)."""
+    for riga in righe:
+        riga = riga.strip()
+        if not riga or riga.startswith("Log ") or riga.startswith("="): continue
+        parola, _, resto = riga.partition(" ")
+        try:
+            if parola == "BRISCOLA": yield "BRISCOLA", resto
+            elif parola == "INIZIO_PARTITA": yield "INIZIO", resto.split(" ", 1)[1]
+            elif parola == "MANO": yield "MANO", int(resto)
+            elif parola == "MANO_IA": yield "MANO_IA", resto.split()
+            elif parola == "GIOCA":
+                nome, carta = resto.rsplit(" ", 1); yield "GIOCA", (nome, carta)
+            elif parola == "PRENDE":
+                nome, _, punti = resto.rsplit(" ", 2); yield "PRENDE", (nome, int(punti))
+            elif parola == "FINALE":
+                m = _FINALE.match(riga); yield "FINALE", (m.group(1), int(m.group(2)), m.group(3), int(m.group(4)))
+            else: yield "?", riga
+        except (ValueError, IndexError, AttributeError): yield "?", riga
+
+def statistiche_vuote():
+    chi = lambda: {"ia": 0, "umano": 0}
+    return {
+        "file": 0, "righe_non_riconosciute": 0,
+        "partite": 0, "partite_complete": 0, "partite_incomplete": 0,
+        "vittorie_ia": 0, "vittorie_umano": 0, "pareggi": 0,
+        "punti_per_briscola": {s: {"partite": 0, "punti_ia": 0, "punti_umano": 0} for s in SEMI},
+        "punti_per_chi_inizia": {k: {"partite": 0, "punti_ia": 0, "punti_umano": 0} for k in ("ia", "umano")},
+        "prese_per_chi_apre": {k: {"mani": 0, "prese_ia": 0, "punti_ia": 0, "punti_umano": 0} for k in ("ia", "umano")},
+        "catture": {v + s: chi() for s in SEMI for v in VALORI},
+        "aperture_ia": {"mani": 0, "perse": 0, "perse_con_punti": 0, "punti_persi": 0},
+    }
+
+class _Partita:
+    """Stato della sola partita in corso durante la lettura."""
+    def __init__(self, briscola):
+        self.briscola = briscola[-1:] if briscola else "?"; self.inizia = None; self.mano_ia = set()
+        self.giocate = []; self.punti = {"ia": 0, "umano": 0}; self.nome_ia = None; self.finita = False
+
+def analizza_righe(righe, stat=None):
+    """Aggiorna (o crea) le statistiche leggendo le righe di un log."""
+    stat = stat or statistiche_vuote(); partita = None
+    for tipo, dati in eventi(righe):
+        if tipo == "BRISCOLA":
+            if partita: _chiudi(partita, stat)
+            partita = _Partita(dati)
+        elif partita is None: stat["righe_non_riconosciute"] += tipo == "?"
+        elif tipo == "INIZIO": partita.inizia = dati
+        elif tipo == "MANO": partita.giocate = []
+        elif tipo == "MANO_IA": partita.mano_ia = set(dati)
+        elif tipo == "GIOCA": partita.giocate.append(dati)
+        elif tipo == "PRENDE": _presa(partita, dati, stat)
+        elif tipo == "FINALE": partita.finita = True
+        else: stat["righe_non_riconosciute"] += 1
+    if partita: _chiudi(partita, stat)
+    return stat
+
+def _presa(partita, dati, stat):
+    if len(partita.giocate) != 2: stat["righe_non_riconosciute"] += 1; return
+    (nome1, carta1), (nome2, carta2) = partita.giocate
+    # L'IA è chi ha giocato una carta della sua mano (MANO_IA viene scritta a ogni mano)
+    if partita.nome_ia is None: partita.nome_ia = nome1 if carta1 in partita.mano_ia else nome2
+    vincitore, punti = dati; chi_vince = "ia" if vincitore == partita.nome_ia else "umano"
+    chi_apre = "ia" if nome1 == partita.nome_ia else "umano"
+    partita.punti[chi_vince] += punti
+    prese = stat["prese_per_chi_apre"][chi_apre]
+    prese["mani"] += 1; prese["prese_ia"] += chi_vince == "ia"; prese["punti_" + chi_vince] += punti
+    for carta in (carta1, carta2):
+        if carta in stat["catture"]: stat["catture"][carta][chi_vince] += 1
+    if chi_apre == "ia":
+        aperture = stat["aperture_ia"]; aperture["mani"] += 1
+        if chi_vince == "umano":
+            aperture["perse"] += 1; aperture["punti_persi"] += punti; aperture["perse_con_punti"] += punti > 0
+    partita.giocate = []
+
+def _chiudi(partita, stat):
+    stat["partite"] += 1
+    if not partita.finita or partita.nome_ia is None: stat["partite_incomplete"] += 1; return
+    stat["partite_complete"] += 1
+    ia, umano = partita.punti["ia"], partita.punti["umano"]
+    if ia > umano: stat["vittorie_ia"] += 1
+    elif umano > ia: stat["vittorie_umano"] += 1
+    else: stat["pareggi"] += 1
+    gruppi = []
+    if partita.briscola in SEMI: gruppi.append(stat["punti_per_briscola"][partita.briscola])
+    if partita.inizia: gruppi.append(stat["punti_per_chi_inizia"]["ia" if partita.inizia == partita.nome_ia else "umano"])
+    for g in gruppi: g["partite"] += 1; g["punti_ia"] += ia; g["punti_umano"] += umano
+
+def analizza_file(percorso):
+    stat = statistiche_vuote(); stat["file"] = 1
+    with open(percorso, 'r', encoding='utf-8', errors='replace') as f: return analizza_righe(f, stat)
+
+def somma(a, b):
+    """Somma ricorsiva di due statistiche con la stessa forma."""
+    return {k: somma(v, b[k]) if isinstance(v, dict) else v + b[k] for k, v in a.items()}
+
+def riepilogo(stat):
+    """Aggiunge alle somme i rapporti utili da leggere."""
+    r = dict(stat); complete = stat["partite_complete"]
+    r["tasso_vittoria_ia"] = stat["vittorie_ia"] / complete if complete else None
+    r["tasso_vittoria_umano"] = stat["vittorie_umano"] / complete if complete else None
+    aperture = stat["aperture_ia"]
+    r["tasso_aperture_ia_perse_con_punti"] = aperture["perse_con_punti"] / aperture["mani"] if aperture["mani"] else None
+    return r
+
+def trova_log(percorsi):
+    """I file dati, più i log (log_*.txt e briscola_log.txt) dentro le cartelle."""
+    for p in percorsi:
+        if os.path.isdir(p):
+            yield from sorted(glob.glob(os.path.join(p, "log_*.txt")) + glob.glob(os.path.join(p, "briscola_log*.txt")))
+        else: yield p
+
+def analizza(percorsi, processi=None):
+    totale = statistiche_vuote(); file = list(trova_log(percorsi))
+    processi = min(processi or os.cpu_count() or 1, max(1, len(file)))
+    if processi == 1: parziali = map(analizza_file, file)
+    else: pool = Pool(processi); parziali = pool.imap_unordered(analizza_file, file, chunksize=16)
+    try:
+        for parziale in parziali: totale = somma(totale, parziale)
+    finally:
+        if processi != 1: pool.close(); pool.join()
+    return riepilogo(totale)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistiche aggregate dai log di testo di Gabryscola.")
+    parser.add_argument("percorsi", nargs="*", default=["."], help="File di log o cartelle (default: la cartella corrente).")
+    parser.add_argument("--processi", type=int, default=None)
+    parser.add_argument("-o", "--output", default=None, help="File JSON del riepilogo (default: a video).")
+    args = parser.parse_args()
+    risultato = analizza(args.percorsi, args.processi)
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(risultato, f, indent=4)
+    else: json.dump(risultato, sys.stdout, indent=4); print()
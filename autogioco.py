@@ -0,0 +1,119 @@
+# GABRYSCOLA - Autogioco
+# Partite IA contro IA senza input, stampe o pause, distribuite su tutti i core.
+# Uso: python autogioco.py [-n PARTITE] [--seme S] [-a maestro] [-b maestro] [--processi P]
+
+import argparse
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from motore import NUM_CARTE, StatoPartita
+from ia import politica_maestro, politica_pesi, carica_profili
+from finale import politica_finale
+from montecarlo import politica_montecarlo
+from registro_binario import ScrittoreRegistro
+
+# --- Politiche ---
+# Una politica riceve (stato, giocatore) e restituisce la carta da giocare (vedi ia.py).
+_rng = random.Random() # Riseminato a ogni partita per la riproducibilità
+
+def politica_casuale(stato, giocatore): return _rng.choice(stato.mosse())
+
+POLITICHE = {"maestro": politica_maestro, "finale": politica_finale, "montecarlo": politica_montecarlo, "casuale": politica_casuale}
+PREFISSO_PROFILO = "profilo:"
+
+def trova_politica(nome):
+    """Una delle POLITICHE, o "profilo:NOME" per l'euristica maestro con i pesi di un profilo salvato (vedi ia.py)."""
+    if nome not in POLITICHE and nome.startswith(PREFISSO_PROFILO):
+        POLITICHE[nome] = politica_pesi(carica_profili()[nome[len(PREFISSO_PROFILO):]])
+    return POLITICHE[nome]
+
+def nomi_politiche():
+    return sorted(POLITICHE) + [PREFISSO_PROFILO + nome for nome in carica_profili() if PREFISSO_PROFILO + nome not in POLITICHE]
+
+def ordine_mescolato(seme):
+    """Ordine del mazzo per il seme dato: stessa permutazione di rng.shuffle su Mazzo().carte."""
+    ordine = list(range(NUM_CARTE)); random.Random(seme).shuffle(ordine)
+    return ordine
+
+def gioca_partita_silenziosa(seme, politica_a, politica_b, a_di_mano=True, giocate=None):
+    """Gioca una partita completa dalla smazzata del seme dato (A è il giocatore 0). Restituisce (punti_a, punti_b).
+    Se giocate è una lista, vi si aggiungono le carte nell'ordine in cui escono."""
+    _rng.seed(seme)
+    stato = StatoPartita(ordine_mescolato(seme), 0 if a_di_mano else 1); politiche = (politica_a, politica_b)
+    while not stato.finita:
+        carta = politiche[stato.turno](stato, stato.turno); stato.giocata(carta)
+        if giocate is not None: giocate.append(carta)
+    return stato.punti[0], stato.punti[1]
+
+# --- Pool di processi ---
+def _gioca_blocco(args):
+    semi, nome_a, nome_b, registra = args
+    politica_a, politica_b = trova_politica(nome_a), trova_politica(nome_b)
+    # Ogni seme si gioca con A di mano nelle partite pari e B di mano nelle dispari.
+    risultati = []
+    for seme in semi:
+        giocate = [] if registra else None
+        punti_a, punti_b = gioca_partita_silenziosa(seme, politica_a, politica_b, seme % 2 == 0, giocate)
+        risultati.append((seme, punti_a, punti_b, bytes(giocate)) if registra else (seme, punti_a, punti_b))
+    return risultati
+
+def _blocchi(semi, dimensione):
+    blocco = []
+    for seme in semi:
+        blocco.append(seme)
+        if len(blocco) == dimensione: yield blocco; blocco = []
+    if blocco: yield blocco
+
+def aggrega(risultati):
+    """Riassume una sequenza di (seme, punti_a, punti_b) dal punto di vista di A."""
+    wins = ties = losses = 0; somma = 0; distribuzione = [0] * 121
+    for _, punti_a, *_ in risultati:
+        if punti_a > 60: wins += 1
+        elif punti_a == 60: ties += 1
+        else: losses += 1
+        somma += punti_a; distribuzione[punti_a] += 1
+    partite = wins + ties + losses
+    return {"partite": partite, "wins": wins, "ties": ties, "losses": losses,
+            "media_punti_a": somma / partite if partite else 0.0, "distribuzione_punti_a": distribuzione}
+
+def simula(semi, politica_a="maestro", politica_b="maestro", processi=None, dimensione_blocco=200, registro=None):
+    """Gioca una partita per ogni seme su un pool di processi e restituisce il riepilogo aggregato.
+    registro (percorso) salva ogni partita nel formato di registro_binario man mano che i blocchi finiscono."""
+    processi = processi or os.cpu_count() or 1
+    inizio = time.perf_counter(); risultati = []
+    lavori = ((blocco, politica_a, politica_b, registro is not None) for blocco in _blocchi(semi, dimensione_blocco))
+    scrittore = ScrittoreRegistro(registro) if registro else None
+    def raccogli(blocco):
+        if scrittore:
+            for seme, punti_a, punti_b, giocate in blocco:
+                scrittore.scrivi(seme, ordine_mescolato(seme), giocate, seme % 2, (punti_a, punti_b))
+            blocco = [r[:3] for r in blocco]
+        risultati.extend(blocco)
+    try:
+        if processi == 1:
+            for lavoro in lavori: raccogli(_gioca_blocco(lavoro))
+        else:
+            with Pool(processi) as pool:
+                for blocco in pool.imap_unordered(_gioca_blocco, lavori): raccogli(blocco)
+    finally:
+        if scrittore: scrittore.chiudi()
+    durata = time.perf_counter() - inizio
+    riepilogo = aggrega(risultati)
+    riepilogo.update({"politica_a": politica_a, "politica_b": politica_b, "secondi": durata,
+                      "partite_al_secondo": riepilogo["partite"] / durata if durata > 0 else 0.0})
+    return riepilogo
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Autogioco Gabryscola: IA contro IA senza interazione.")
+    parser.add_argument("-n", "--partite", type=int, default=1000)
+    parser.add_argument("--seme", type=int, default=0, help="Primo seme; le partite usano semi consecutivi.")
+    parser.add_argument("-a", "--politica-a", choices=nomi_politiche(), default="maestro")
+    parser.add_argument("-b", "--politica-b", choices=nomi_politiche(), default="maestro")
+    parser.add_argument("--processi", type=int, default=None)
+    parser.add_argument("--registro", default=None, help="File .gbr in cui salvare ogni partita (registro_binario).")
+    args = parser.parse_args()
+    r = simula(range(args.seme, args.seme + args.partite), args.politica_a, args.politica_b, args.processi, registro=args.registro)
+    print(f"{r['politica_a']} contro {r['politica_b']}: {r['partite']} partite in {r['secondi']:.2f} s ({r['partite_al_secondo']:.0f} partite/s)")
+    print(f"V-P-S di A: {r['wins']}-{r['ties']}-{r['losses']}. Media punti A: {r['media_punti_a']:.2f}")
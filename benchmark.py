@@ -0,0 +1,232 @@
+# GABRYSCOLA - Benchmark del motore e dell'IA
+# Misura a semi fissi i punti caldi del gioco: Mazzo, pesca, _determina_vincitore_mano, le decisioni dell'IA
+# maestro, Giocatore.calcola_punteggio e gioca_partita intera, con un pilota senza input né stampe.
+# Per ogni prova tiene il migliore e la mediana di più ripetizioni; per la partita anche picco di memoria
+# e blocchi trattenuti a fine partita (tracemalloc). I risultati si salvano in JSON e si confrontano con una base.
+# Uso: python benchmark.py esegui [-o benchmark_base.json] [--partite 100] [--ripetizioni 5] [--seme 12345]
+#      python benchmark.py confronta benchmark_base.json [--nuovo risultati.json] [--soglia 0.10]
+#      python benchmark.py profila [--partite 20] [--seme 12345] [-o profilo_banco]
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import finale
+import gabryscola
+import profilazione
+
+VERSIONE_BENCHMARK = 1
+SEME = 12345
+SOGLIA = 0.10 # Peggioramento relativo oltre il quale una prova conta come regressione
+
+class BriscolaSenzaTesta(gabryscola.Briscola):
+    """Briscola senza input né riflessione: al posto dell'umano gioca una carta a caso da un rng con seme.
+    Con registra_posizioni, ogni posizione in cui decide l'IA finisce in self.posizioni come (briscola, posizione)."""
+
+    def __init__(self, seme, registra_posizioni=False):
+        random.seed(seme) # Anche generate_ai_name e la smazzata usano il modulo random
+        super().__init__("Banco")
+        self.rng = random.Random(seme); self.riflessione_attiva = False; self.cache_decisioni = None
+        self.posizioni = [] if registra_posizioni else None
+
+    def _stampa_prompt_giocatore(self):
+        return self.giocatore_umano.mano.pop(self.rng.randrange(len(self.giocatore_umano.mano)))
+
+    def _scelta_computer(self):
+        if self.posizioni is not None: self.posizioni.append((self.briscola, self._posizione_ia()))
+        return self._scelta_computer_maestro()
+
+    def gioca(self, seme):
+        """Una partita completa dalla smazzata del seme dato, senza stampe. Restituisce (punti umano, punti IA)."""
+        random.seed(seme)
+        di_mano = self.giocatore_umano if seme % 2 == 0 else self.giocatore_pc
+        with open(os.devnull, 'w') as nulla, contextlib.redirect_stdout(nulla):
+            _, punti_u, punti_pc = self.gioca_partita(di_mano)
+        return punti_u, punti_pc
+
+# --- Prove ---
+# Ogni prova prepara i dati fuori dal tempo e restituisce una funzione che esegue il lavoro e ne conta le unità.
+
+def prova_mazzo(seme, n):
+    def esegui():
+        for _ in range(n): gabryscola.Mazzo()
+        return n
+    return "mazzi", esegui
+
+def prova_pesca(seme, n):
+    rng = random.Random(seme); mazzi = []
+    for _ in range(n):
+        mazzo = gabryscola.Mazzo(); rng.shuffle(mazzo.carte); mazzi.append(mazzo)
+    def esegui():
+        for mazzo in mazzi:
+            mazzo._cursore = 0
+            while len(mazzo): mazzo.pesca(1)
+        return n * len(gabryscola.Mazzo.CARTE)
+    return "carte", esegui
+
+def prova_vincitore_mano(seme, n):
+    rng = random.Random(seme); gioco = BriscolaSenzaTesta(seme); carte = gabryscola.Mazzo.CARTE
+    coppie = [tuple(rng.sample(carte, 2)) for _ in range(n)]; g1, g2 = gioco.giocatore_umano, gioco.giocatore_pc
+    gioco.briscola = carte[rng.randrange(len(carte))]; determina = gioco._determina_vincitore_mano
+    def esegui():
+        for c1, c2 in coppie: determina(c1, g1, c2, g2)
+        return n
+    return "mani", esegui
+
+def _posizioni_ia(seme, partite):
+    gioco = BriscolaSenzaTesta(seme, registra_posizioni=True)
+    for s in range(seme, seme + partite): gioco.gioca(s)
+    return gioco, gioco.posizioni
+
+def prova_decisioni(seme, n, risolutore=False):
+    gioco, posizioni = _posizioni_ia(seme, max(1, n // 20))
+    def esegui():
+        # Risolutore nuovo a ogni ripetizione: la tabella di trasposizione non passa da una all'altra
+        gioco.risolutore_finale = finale.RisolutoreFinale() if risolutore else None
+        for briscola, posizione in posizioni: gioco.briscola = briscola; gioco._carta_maestro(posizione)
+        return len(posizioni)
+    return "decisioni", esegui
+
+def prova_punteggio(seme, n):
+    rng = random.Random(seme); giocatore = gabryscola.Giocatore("Banco")
+    giocatore.mazzetto = rng.sample(gabryscola.Mazzo.CARTE, 20)
+    def esegui():
+        for _ in range(n): giocatore.calcola_punteggio()
+        return n
+    return "calcoli", esegui
+
+def prova_partite(seme, n):
+    def esegui():
+        gioco = BriscolaSenzaTesta(seme)
+        for s in range(seme, seme + n): gioco.gioca(s)
+        return n
+    return "partite", esegui
+
+PROVE = {
+    "mazzo_costruzione": (prova_mazzo, 200),
+    "mazzo_pesca": (prova_pesca, 10),
+    "determina_vincitore_mano": (prova_vincitore_mano, 1000),
+    "decisioni_euristica": (prova_decisioni, 1),
+    "decisioni_maestro": (lambda seme, n: prova_decisioni(seme, n, risolutore=True), 1),
+    "calcola_punteggio": (prova_punteggio, 200),
+    "gioca_partita": (prova_partite, 1),
+}
+
+def _cronometra(esegui, ripetizioni):
+    """(migliore, mediana) delle unità al secondo su più ripetizioni."""
+    velocita = []
+    for _ in range(ripetizioni):
+        gc.collect(); inizio = time.perf_counter(); unita = esegui(); durata = time.perf_counter() - inizio
+        velocita.append(unita / durata if durata > 0 else float("inf"))
+    return max(velocita), statistics.median(velocita)
+
+def misura_memoria(seme, partite):
+    """Picco di memoria e blocchi trattenuti per partita, mediane su più partite. I blocchi trattenuti sono quelli
+    nati durante la partita e ancora vivi alla fine (soprattutto la crescita delle tabelle del risolutore e delle
+    cache), non tutte le allocazioni: tracemalloc e sys.getallocatedblocks vedono solo i blocchi vivi, e un
+    contatore di tutte le allocazioni chiederebbe un allocatore in C (PyMem_SetAllocator)."""
+    gioco = BriscolaSenzaTesta(seme); gioco.gioca(seme) # Una partita di riscaldamento riempie le tabelle del risolutore
+    picchi, blocchi = [], []
+    tracemalloc.start()
+    try:
+        for s in range(seme, seme + partite):
+            gc.collect(); prima = tracemalloc.take_snapshot(); base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak(); gioco.gioca(s)
+            picchi.append(tracemalloc.get_traced_memory()[1] - base)
+            dopo = tracemalloc.take_snapshot()
+            blocchi.append(sum(max(0, d.count_diff) for d in dopo.compare_to(prima, "lineno")))
+    finally: tracemalloc.stop()
+    return {"picco_byte_per_partita": statistics.median(picchi), "picco_byte_massimo": max(picchi),
+            "blocchi_trattenuti_per_partita": statistics.median(blocchi)}
+
+def esegui_benchmark(partite=100, ripetizioni=5, seme=SEME):
+    """Esegue tutte le prove e restituisce il dizionario dei risultati."""
+    risultati = {}
+    for nome, (prova, scala) in PROVE.items():
+        unita, esegui = prova(seme, partite * scala)
+        esegui() # Riscaldamento
+        migliore, mediana = _cronometra(esegui, ripetizioni)
+        risultati[nome] = {"unita": unita, "al_secondo": migliore, "mediana_al_secondo": mediana}
+    memoria = misura_memoria(seme, max(1, partite // 5))
+    return {"versione": VERSIONE_BENCHMARK, "seme": seme, "partite": partite, "ripetizioni": ripetizioni,
+            "python": platform.python_version(), "piattaforma": platform.platform(), "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "risultati": risultati, "memoria": memoria}
+
+def confronta(base, nuovo, soglia=SOGLIA):
+    """Righe (nome, valore base, valore nuovo, variazione, regressione). Velocità: peggio se scende; memoria: peggio se sale."""
+    righe = []
+    for nome, voce in base.get("risultati", {}).items():
+        if nome not in nuovo.get("risultati", {}): continue
+        vecchio, attuale = voce["al_secondo"], nuovo["risultati"][nome]["al_secondo"]
+        variazione = attuale / vecchio - 1 if vecchio else 0.0
+        righe.append((nome, vecchio, attuale, variazione, variazione < -soglia))
+    for nome, vecchio in base.get("memoria", {}).items():
+        if nome not in nuovo.get("memoria", {}): continue
+        attuale = nuovo["memoria"][nome]; variazione = attuale / vecchio - 1 if vecchio else 0.0
+        righe.append((nome, vecchio, attuale, variazione, variazione > soglia))
+    return righe
+
+def profila(partite, seme=SEME, nome_base=None):
+    """Le stesse misure della modalità profile, su partite senza testa. Con nome_base salva anche .prof e pile."""
+    profilatore = profilazione.Profilatore().installa(gabryscola.Briscola, gabryscola.Mazzo)
+    if nome_base: profilatore.avvia_profilo()
+    try:
+        gioco = BriscolaSenzaTesta(seme)
+        for s in range(seme, seme + partite): gioco.gioca(s)
+    finally:
+        profilatore.ferma_profilo(); profilatore.disinstalla()
+    for riga in profilatore.riepilogo(): print(riga)
+    if nome_base: print(f"File salvati: {', '.join(profilatore.salva(nome_base))}.")
+
+def stampa(risultato):
+    for nome, voce in risultato["risultati"].items():
+        print(f"{nome:<26}{voce['al_secondo']:>14,.0f} {voce['unita']}/s (mediana {voce['mediana_al_secondo']:,.0f})")
+    for nome, valore in risultato["memoria"].items(): print(f"{nome:<30}{valore:>12,.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark di Gabryscola a semi fissi.")
+    comandi = parser.add_subparsers(dest="comando", required=True)
+    for nome, aiuto in (("esegui", "Esegue le prove e salva i risultati."), ("confronta", "Confronta con una base e segnala le regressioni.")):
+        p = comandi.add_parser(nome, help=aiuto)
+        if nome == "confronta":
+            p.add_argument("base")
+            p.add_argument("--nuovo", default=None, help="Risultati già salvati da confrontare (default: esegue le prove ora).")
+            p.add_argument("--soglia", type=float, default=SOGLIA, help="Peggioramento relativo tollerato (default 0.10).")
+        p.add_argument("-o", "--output", default="benchmark_base.json" if nome == "esegui" else None)
+        p.add_argument("--partite", type=int, default=100)
+        p.add_argument("--ripetizioni", type=int, default=5)
+        p.add_argument("--seme", type=int, default=SEME)
+    p = comandi.add_parser("profila", help="Tempi dei punti caldi su partite senza testa, con cProfile e pile a richiesta.")
+    p.add_argument("--partite", type=int, default=20)
+    p.add_argument("--seme", type=int, default=SEME)
+    p.add_argument("-o", "--output", default=None, help="Nome base dei file .prof e .pile.txt (default: nessun file).")
+    args = parser.parse_args()
+    if args.comando == "profila": profila(args.partite, args.seme, args.output); sys.exit(0)
+    if args.comando == "confronta" and args.nuovo:
+        with open(args.nuovo, 'r') as f: risultato = json.load(f)
+    else:
+        if args.comando == "confronta":
+            # Stesse condizioni della base, se non indicate
+            with open(args.base, 'r') as f: base = json.load(f)
+            args.partite, args.seme = base.get("partite", args.partite), base.get("seme", args.seme)
+        risultato = esegui_benchmark(args.partite, args.ripetizioni, args.seme); stampa(risultato)
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(risultato, f, indent=4)
+        print(f"Risultati salvati in {args.output}.")
+    if args.comando == "confronta":
+        with open(args.base, 'r') as f: base = json.load(f)
+        regressioni = 0
+        print(f"\nConfronto con {args.base} (soglia {args.soglia:.0%}):")
+        for nome, vecchio, attuale, variazione, regressione in confronta(base, risultato, args.soglia):
+            regressioni += regressione
+            print(f"{nome:<30}{vecchio:>14,.0f}{attuale:>14,.0f}{variazione:>+9.1%}{'  REGRESSIONE' if regressione else ''}")
+        print(f"Regressioni: {regressioni}.")
+        sys.exit(1 if regressioni else 0)
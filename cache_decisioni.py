@@ -0,0 +1,161 @@
+# GABRYSCOLA - Cache delle decisioni dell'IA
+# La stessa posizione si ripresenta di partita in partita, a meno di rinumerare i tre semi che non sono briscola.
+# La chiave canonica porta la briscola al seme 0 e sceglie, fra le 6 rinumerazioni degli altri semi, quella
+# che dà la chiave più piccola. Le voci sono in una LRU limitata, salvabile su disco come "libro" delle aperture.
+# A parità di valore l'euristica gioca la prima carta della mano: ogni voce ricorda anche le carte pari, perché
+# la cache rompa la parità allo stesso modo in una posizione rinumerata.
+# Nelle ultime pescate e a mazzo finito decide il risolutore esatto: lì chi usa la cache non la consulta.
+# Uso: python cache_decisioni.py libro [-n PARTITE] [--politica maestro] [--uscite 8] [-o briscola_libro.json]
+#      python cache_decisioni.py info briscola_libro.json
+
+import argparse
+import json
+import os
+from collections import OrderedDict
+from multiprocessing import Pool
+
+import ia
+from motore import NESSUNA, StatoPartita, maschera
+
+CAPACITA = 200000
+LIBRO_FILE = "briscola_libro.json"
+VERSIONE_LIBRO = 2 # Dalla 2 ogni voce ha anche le carte pari
+# Politiche dell'autogioco i cui libri valgono per ciascun livello di IA del gioco
+LIBRI_COMPATIBILI = {"maestro": ("maestro", "finale"), "montecarlo": ("montecarlo",)}
+
+def _rinumera_maschera(m, p):
+    return ((m & 0x3FF) << (10 * p[0]) | (m >> 10 & 0x3FF) << (10 * p[1])
+            | (m >> 20 & 0x3FF) << (10 * p[2]) | (m >> 30 & 0x3FF) << (10 * p[3]))
+
+def _rinumera_carta(c, p): return c if c == NESSUNA else p[c // 10] * 10 + c % 10
+
+def _voce(carta, valore, pari, p):
+    """(carta, valore, pari) rinumerate: pari è la maschera delle carte che valevano quanto la scelta, 0 se era l'unica."""
+    return _rinumera_carta(carta, p), valore, maschera([_rinumera_carta(c, p) for c in pari]) if len(pari) > 1 else 0
+
+def chiave_canonica(mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo):
+    """(chiave, rinumerazione usata). Della briscola scoperta conta solo il valore: il seme è sempre 0.
+    Invece di provare le 6 rinumerazioni si ordinano i tre semi per firma (uscite, mano, tavolo del seme):
+    la più grande va al seme 1, la più piccola al 3, e la chiave è la stessa più piccola delle 6."""
+    mano_m = maschera(mano)
+    firme = [(uscite >> 10 * s & 0x3FF, mano_m >> 10 * s & 0x3FF, carta_tavolo % 10 if carta_tavolo // 10 == s else -1) for s in range(4)]
+    p = [0] * 4
+    for n, s in enumerate(sorted((s for s in range(4) if s != seme_briscola), key=firme.__getitem__, reverse=True), 1): p[s] = n
+    chiave = (_rinumera_maschera(uscite, p), _rinumera_maschera(mano_m, p), _rinumera_carta(carta_tavolo, p), carte_nel_mazzo, carta_briscola % 10)
+    return chiave, p
+
+class CacheDecisioni:
+    """LRU delle decisioni: posizione canonica -> (carta canonica, valutazione, pari). Tiene i contatori per dimensionarla."""
+
+    def __init__(self, capacita=CAPACITA):
+        self.capacita = capacita; self._voci = OrderedDict()
+        self.successi = 0; self.mancati = 0; self.sfratti = 0
+
+    def __len__(self): return len(self._voci)
+
+    def cerca(self, mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo):
+        """(carta, valutazione) se la posizione, o una equivalente, è già stata decisa; altrimenti None."""
+        chiave, p = chiave_canonica(mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo)
+        voce = self._voci.get(chiave)
+        if voce is None: self.mancati += 1; return None
+        self._voci.move_to_end(chiave); self.successi += 1
+        carta, valore, pari = voce
+        # A parità di valore l'euristica gioca la prima carta della mano: si fa lo stesso fra le pari rinumerate
+        if pari: return next(c for c in mano if pari >> _rinumera_carta(c, p) & 1), valore
+        return p.index(carta // 10) * 10 + carta % 10, valore
+
+    def memorizza(self, mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo, carta, valore=None, pari=()):
+        """pari sono le carte della mano che valevano quanto la scelta (ia.scelta_maestro_pari): vuota se non ce n'erano."""
+        chiave, p = chiave_canonica(mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo)
+        self._inserisci(chiave, _voce(carta, valore, pari, p))
+
+    def _inserisci(self, chiave, voce):
+        self._voci[chiave] = voce; self._voci.move_to_end(chiave)
+        while len(self._voci) > self.capacita:
+            self._voci.popitem(last=False); self.sfratti += 1
+
+    def statistiche(self):
+        richieste = self.successi + self.mancati
+        return {"voci": len(self._voci), "capacita": self.capacita, "successi": self.successi, "mancati": self.mancati,
+                "sfratti": self.sfratti, "tasso_successo": self.successi / richieste if richieste else 0.0}
+
+    def descrizione(self):
+        """Le statistiche in una frase, per il riepilogo del profilo e la simulazione del server."""
+        s = self.statistiche()
+        return (f"{s['voci']} voci su {s['capacita']}, {s['successi']} successi su {s['successi'] + s['mancati']} richieste "
+                f"({s['tasso_successo']:.0%}), {s['sfratti']} sfratti.")
+
+    def salva(self, percorso, politica):
+        """Scrive le voci (dalla meno alla più recente) con la politica che le ha prodotte."""
+        dati = {"versione": VERSIONE_LIBRO, "politica": politica, "voci": [list(k) + list(v) for k, v in self._voci.items()]}
+        temporaneo = percorso + ".tmp"
+        with open(temporaneo, 'w') as f: json.dump(dati, f)
+        os.replace(temporaneo, percorso)
+
+    def carica(self, percorso, livello=None):
+        """Aggiunge le voci di un libro; con livello ("maestro" o "montecarlo") lo ignora se prodotto da un'IA diversa.
+        Restituisce il numero di voci caricate."""
+        try:
+            with open(percorso, 'r') as f: dati = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError): return 0
+        if dati.get("versione") != VERSIONE_LIBRO: return 0
+        if livello is not None and dati.get("politica") not in LIBRI_COMPATIBILI.get(livello, ()): return 0
+        for voce in dati.get("voci", []): self._inserisci(tuple(voce[:5]), (voce[5], voce[6], voce[7]))
+        return len(dati.get("voci", []))
+
+# --- Costruzione del libro in autogioco ---
+def _decisioni_partite(args):
+    """Gioca le partite dei semi dati e restituisce le decisioni prese con al più max_uscite carte uscite."""
+    semi, nome_politica, max_uscite = args
+    from autogioco import POLITICHE, ordine_mescolato
+    politica = POLITICHE[nome_politica]; voci = {}
+    for seme in semi:
+        stato = StatoPartita(ordine_mescolato(seme), seme % 2)
+        while not stato.finita:
+            g = stato.turno; carta = politica(stato, g)
+            if bin(stato.uscite).count("1") <= max_uscite:
+                mano = stato.mosse(); pari = ()
+                if nome_politica in LIBRI_COMPATIBILI["maestro"]:
+                    pari = ia.scelta_maestro_pari(mano, stato.tavolo, stato.briscola, ia.incognite_per(stato, g), stato.carte_nel_mazzo())[2]
+                    if carta not in pari: pari = () # Scelta del risolutore, non dell'euristica
+                chiave, p = chiave_canonica(mano, stato.tavolo, stato.briscola, stato.carta_briscola, stato.uscite, stato.carte_nel_mazzo())
+                voci.setdefault(chiave, _voce(carta, None, pari, p))
+            stato.giocata(carta)
+    return voci
+
+def costruisci_libro(semi, politica="maestro", max_uscite=8, capacita=CAPACITA, processi=None, blocco=200):
+    """Libro delle prime mani dall'autogioco della politica data, su un pool di processi."""
+    semi = list(semi); cache = CacheDecisioni(capacita)
+    lavori = [(semi[i:i + blocco], politica, max_uscite) for i in range(0, len(semi), blocco)]
+    processi = processi or os.cpu_count() or 1
+    if processi == 1: risultati = map(_decisioni_partite, lavori)
+    else: pool = Pool(processi); risultati = pool.imap(_decisioni_partite, lavori)
+    try:
+        for voci in risultati:
+            for chiave, voce in voci.items():
+                if chiave not in cache._voci: cache._inserisci(chiave, voce)
+    finally:
+        if processi != 1: pool.close(); pool.join()
+    return cache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Libro delle decisioni dell'IA di Gabryscola.")
+    comandi = parser.add_subparsers(dest="comando", required=True)
+    libro = comandi.add_parser("libro", help="Costruisce il libro delle prime mani con l'autogioco.")
+    libro.add_argument("-n", "--partite", type=int, default=10000)
+    libro.add_argument("--seme", type=int, default=0)
+    libro.add_argument("--politica", default="maestro", choices=sorted({p for v in LIBRI_COMPATIBILI.values() for p in v}))
+    libro.add_argument("--uscite", type=int, default=8, help="Registra solo le decisioni con al più tante carte uscite.")
+    libro.add_argument("--capacita", type=int, default=CAPACITA)
+    libro.add_argument("--processi", type=int, default=None)
+    libro.add_argument("-o", "--output", default=LIBRO_FILE)
+    info = comandi.add_parser("info", help="Mostra quante voci ha un libro.")
+    info.add_argument("percorso")
+    args = parser.parse_args()
+    if args.comando == "libro":
+        cache = costruisci_libro(range(args.seme, args.seme + args.partite), args.politica, args.uscite, args.capacita, args.processi)
+        cache.salva(args.output, args.politica)
+        print(f"Libro salvato in {args.output}: {len(cache)} posizioni da {args.partite} partite ({args.politica}).")
+    else:
+        cache = CacheDecisioni(float("inf")); n = cache.carica(args.percorso)
+        print(f"{args.percorso}: {n} posizioni.")
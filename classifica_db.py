@@ -0,0 +1,90 @@
+# GABRYSCOLA - Classifica su SQLite
+# Ogni risultato di match resta nello storico; la classifica è una query sull'indice della chiave di ordinamento
+# (punti match, vittorie, sconfitte, punti totali), senza riordinare tutto. Gli inserimenti sono transazioni
+# atomiche, quindi più processi possono scrivere insieme senza perdere voci.
+# Uso: python classifica_db.py importa [briscola_charts.json]   |   python classifica_db.py mostra [-k 30]
+
+import argparse
+import json
+import sqlite3
+from datetime import date
+
+CLASSIFICA_DB = "briscola_charts.db"
+CLASSIFICA_JSON = "briscola_charts.json"
+ATTESA_BLOCCO = 30.0 # Secondi di attesa se un altro processo sta scrivendo
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS risultati (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    ties INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    punti_totali INTEGER NOT NULL DEFAULT 0,
+    punti_match REAL NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS indice_classifica ON risultati (punti_match DESC, wins DESC, losses ASC, punti_totali DESC, id ASC);
+CREATE TABLE IF NOT EXISTS meta (chiave TEXT PRIMARY KEY, valore TEXT);
+"""
+# Stesso ordine di get_sort_key della vecchia classifica JSON; a parità resta prima la voce più vecchia
+_ORDINE = "ORDER BY punti_match DESC, wins DESC, losses ASC, punti_totali DESC, id ASC"
+_COLONNE = ("nome", "wins", "ties", "losses", "punti_totali", "data")
+
+def _riga(nome, wins, ties, losses, punti_totali, data=None):
+    return (nome, wins, ties, losses, punti_totali, wins * 1.0 + ties * 0.5, data or date.today().strftime("%d/%m/%Y"))
+
+class ClassificaDB:
+    """Archivio dei risultati. Usabile come context manager."""
+
+    def __init__(self, percorso=CLASSIFICA_DB):
+        self.conn = sqlite3.connect(percorso, timeout=ATTESA_BLOCCO)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn: self.conn.executescript(_SCHEMA)
+
+    def __enter__(self): return self
+    def __exit__(self, *eccezione): self.chiudi()
+    def chiudi(self): self.conn.close()
+
+    def registra(self, nome, wins, ties, losses, punti_totali, data=None):
+        """Aggiunge un risultato in una transazione atomica."""
+        self.registra_molti([(nome, wins, ties, losses, punti_totali, data)])
+
+    def registra_molti(self, risultati):
+        """Aggiunge molti (nome, wins, ties, losses, punti_totali[, data]) in un'unica transazione: per l'autogioco."""
+        with self.conn:
+            self.conn.executemany("INSERT INTO risultati (nome, wins, ties, losses, punti_totali, punti_match, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (_riga(*r) for r in risultati))
+
+    def migliori(self, k):
+        """Le prime k voci della classifica, come dizionari con le chiavi della vecchia classifica JSON."""
+        cursore = self.conn.execute(f"SELECT {', '.join(_COLONNE)} FROM risultati {_ORDINE} LIMIT ?", (k,))
+        return [dict(zip(_COLONNE, riga)) for riga in cursore]
+
+    def __len__(self): return self.conn.execute("SELECT COUNT(*) FROM risultati").fetchone()[0]
+
+    def importa_json(self, percorso=CLASSIFICA_JSON):
+        """Importa una sola volta la vecchia briscola_charts.json; restituisce le voci importate (0 se già fatto o assente)."""
+        try:
+            with open(percorso, 'r') as f: voci = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError): return 0
+        with self.conn:
+            # INSERT OR IGNORE sul segnaposto rende l'importazione sicura anche con due processi insieme
+            if self.conn.execute("INSERT OR IGNORE INTO meta (chiave, valore) VALUES ('importato_json', ?)", (percorso,)).rowcount == 0: return 0
+            self.conn.executemany("INSERT INTO risultati (nome, wins, ties, losses, punti_totali, punti_match, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (_riga(v.get('nome', 'N/D'), v.get('wins', 0), v.get('ties', 0), v.get('losses', 0), v.get('punti_totali', 0), v.get('data', 'N/D')) for v in voci))
+        return len(voci)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classifica di Gabryscola su SQLite.")
+    parser.add_argument("--db", default=CLASSIFICA_DB)
+    comandi = parser.add_subparsers(dest="comando", required=True)
+    importa = comandi.add_parser("importa", help="Importa una volta sola la classifica JSON.")
+    importa.add_argument("percorso", nargs="?", default=CLASSIFICA_JSON)
+    mostra = comandi.add_parser("mostra", help="Stampa le prime voci.")
+    mostra.add_argument("-k", type=int, default=30)
+    args = parser.parse_args()
+    with ClassificaDB(args.db) as db:
+        if args.comando == "importa": print(f"Voci importate: {db.importa_json(args.percorso)}.")
+        else:
+            for i, v in enumerate(db.migliori(args.k), 1): print(f"{i}. {v['nome']} {v['wins']}-{v['ties']}-{v['losses']} {v['punti_totali']} {v['data']}")
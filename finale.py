@@ -0,0 +1,201 @@
+# GABRYSCOLA - Risolutore esatto del finale
+# Quando il mazzo è finito le due mani sono note: alfa-beta a informazione perfetta con tabella di trasposizione.
+# Con poche carte ancora nel mazzo (soglia) si cerca su ogni smazzata possibile delle incognite e si
+# sceglie la carta col miglior valore medio.
+# La tabella ha un numero fisso di posti (chi arriva sostituisce chi c'era), così non si svuota mai tutta in una
+# volta; chiavi e voci sono interi, perché il garbage collector non debba mai attraversarla. Ogni voce ricorda
+# anche la mossa migliore, che si prova per prima. A mazzo finito, due o tre carte a testa si risolvono in chiaro
+# senza tabella. Ogni scelta ha un tetto di nodi, largo abbastanza per tutte le smazzate di un'apertura: se lo
+# supera decide l'euristica, perché una media su parte delle smazzate favorirebbe le prime in ordine.
+
+from itertools import combinations, permutations
+
+from motore import NUM_CARTE, NESSUNA, TUTTE, BIT, PUNTI_PRESA, VINCE_PRIMA, carte, maschera
+import ia
+
+SOGLIA_MAZZO = 2 # Con 2 carte nel mazzo le smazzate sono al massimo 4
+POSTI_TABELLA = 1 << 15 # Per seme di briscola; potenza di 2
+MAX_NODI_SCELTA = 400 # Tetto per scelta, foglie a due carte comprese: un'apertura a due carte dal fondo ne chiede al massimo ~300
+
+class _RicercaInterrotta(Exception): pass
+
+class RisolutoreFinale:
+    """Sceglie la carta ottima nel finale. Nella ricerca l'IA è sempre il giocatore 0 e massimizza i propri punti futuri."""
+
+    def __init__(self, soglia_mazzo=SOGLIA_MAZZO, max_nodi=MAX_NODI_SCELTA):
+        self.soglia_mazzo = soglia_mazzo; self.max_nodi = max_nodi
+        self.tabelle = [{} for _ in range(4)] # Una tabella di trasposizione per seme di briscola: posto -> voce
+        self.nodi = 0; self._limite_nodi = float("inf")
+        self.interrotte = 0 # Scelte che hanno toccato il tetto di nodi
+
+    def applicabile(self, carte_nel_mazzo): return carte_nel_mazzo <= self.soglia_mazzo
+
+    def scegli(self, mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo):
+        """Carta da giocare (dalla sequenza mano, a parità la prima) o NESSUNA se il mazzo supera la soglia
+        o se il tetto di nodi arriva prima che siano concluse tutte le smazzate.
+        uscite è la maschera delle carte già prese, carta_briscola quella scoperta in fondo al mazzo."""
+        if not self.applicabile(carte_nel_mazzo) or not mano: return NESSUNA
+        if len(mano) == 1: return mano[0]
+        self._prepara(seme_briscola)
+        mia = maschera(mano)
+        totali = [0] * len(mano)
+        self._limite_nodi = self.nodi + self.max_nodi
+        try:
+            for mano_avv, mazzo in self._smazzate(mia, carta_tavolo, carta_briscola, uscite, carte_nel_mazzo):
+                valori = [self._dopo_giocata(mia, mano_avv, carta_tavolo, 0, mazzo, c, -1, 121) for c in mano]
+                for i, v in enumerate(valori): totali[i] += v
+        except _RicercaInterrotta:
+            # Una media su parte delle smazzate peserebbe solo le prime in ordine: meglio l'euristica
+            self.interrotte += 1; return NESSUNA
+        finally: self._limite_nodi = float("inf")
+        migliore = max(range(len(mano)), key=lambda i: (totali[i], -i))
+        return mano[migliore]
+
+    def valore_esatto(self, m0, m1, tavolo, turno, seme_briscola, mazzo=()):
+        """Punti futuri del giocatore 0 col gioco perfetto di entrambi, a carte tutte note (mazzo dall'alto, briscola in fondo).
+        Senza tetto di nodi: il valore è sempre esatto."""
+        self._prepara(seme_briscola)
+        return self._valore(m0, m1, tavolo, turno, _mazzo_intero(mazzo), -1, 121)
+
+    def _prepara(self, seme_briscola):
+        self._vince = VINCE_PRIMA[seme_briscola]; self._tabella = self.tabelle[seme_briscola]
+
+    def _smazzate(self, mia, carta_tavolo, carta_briscola, uscite, carte_nel_mazzo):
+        """Ogni assegnazione delle incognite a mano avversaria e mazzo (la briscola scoperta resta in fondo)."""
+        tavolo = 0 if carta_tavolo == NESSUNA else BIT[carta_tavolo]
+        fondo = BIT[carta_briscola] if carte_nel_mazzo > 0 else 0
+        incognite = carte(TUTTE & ~uscite & ~mia & ~tavolo & ~fondo)
+        carte_avv = bin(mia).count("1") - (1 if tavolo else 0)
+        for mano_avv in combinations(incognite, carte_avv):
+            resto = [c for c in incognite if c not in mano_avv]
+            for ordine in permutations(resto):
+                yield maschera(mano_avv), _mazzo_intero(ordine + ((carta_briscola,) if fondo else ()))
+
+    def _dopo_giocata(self, m0, m1, tavolo, turno, mazzo, c, alfa, beta):
+        """Punti futuri del giocatore 0 dopo che il giocatore di turno ha giocato c."""
+        if turno == 0: m0 ^= BIT[c]
+        else: m1 ^= BIT[c]
+        if tavolo == NESSUNA: return self._valore(m0, m1, c, 1 - turno, mazzo, alfa, beta)
+        indice = tavolo * NUM_CARTE + c
+        vincitore = 1 - turno if self._vince[indice] else turno
+        guadagno = PUNTI_PRESA[indice] if vincitore == 0 else 0
+        if mazzo:
+            primo = BIT[(mazzo & 63) - 1]; secondo = BIT[(mazzo >> 6 & 63) - 1]; mazzo >>= 12
+            if vincitore == 0: m0 |= primo; m1 |= secondo
+            else: m1 |= primo; m0 |= secondo
+        return guadagno + self._valore(m0, m1, NESSUNA, vincitore, mazzo, alfa - guadagno, beta - guadagno)
+
+    def _valore(self, m0, m1, tavolo, turno, mazzo, alfa, beta):
+        """Alfa-beta: il giocatore 0 massimizza i suoi punti futuri, l'1 li minimizza.
+        Ogni voce della tabella è un intero: la chiave completa, poi mossa migliore + 1, alto e basso su 7 bit."""
+        if not (m0 or m1): return 0
+        vince = self._vince
+        if not mazzo and not (m0 & (m0 - 1) or m1 & (m1 - 1)):
+            # Ultima presa: una carta a testa, niente da scegliere
+            c0 = m0.bit_length() - 1; c1 = m1.bit_length() - 1
+            if tavolo == NESSUNA: primo, secondo, vince_0 = (c0, c1, True) if turno == 0 else (c1, c0, False)
+            else: primo, secondo, vince_0 = tavolo, (c0 if turno == 0 else c1), turno == 1
+            indice = primo * NUM_CARTE + secondo
+            return PUNTI_PRESA[indice] if vince[indice] == vince_0 else 0
+        if not mazzo and tavolo == NESSUNA:
+            # A tavolo vuoto e mazzo finito le mani hanno lo stesso numero di carte: due o tre si risolvono senza tabella
+            resto = m0 & (m0 - 1); resto &= resto - 1
+            if not resto: return self._due_carte(m0, m1, turno)
+            if not resto & (resto - 1): return self._tre_carte(m0, m1, turno, alfa, beta)
+        self.nodi += 1
+        if self.nodi > self._limite_nodi: raise _RicercaInterrotta
+        chiave = m0 | m1 << 40 | (tavolo + 1) << 80 | turno << 86 | mazzo << 87
+        posto = hash((m0, m1, tavolo, turno, mazzo)) & (POSTI_TABELLA - 1)
+        voce = self._tabella.get(posto); mossa = NESSUNA
+        if voce is not None and voce >> 20 == chiave:
+            basso = voce & 127; alto = voce >> 7 & 127; mossa = (voce >> 14 & 63) - 1
+            if basso == alto or basso >= beta: return basso
+            if alto <= alfa: return alto
+            alfa = max(alfa, basso); beta = min(beta, alto)
+        else: basso, alto = 0, 120
+        alfa_iniziale, beta_iniziale = alfa, beta
+        massimizza = turno == 0; migliore = -1 if massimizza else 121; migliore_carta = NESSUNA
+        mosse = _carte_mano(m0 if massimizza else m1)
+        if mossa != NESSUNA and mosse[0] != mossa: mosse = [mossa] + [c for c in mosse if c != mossa]
+        for c in mosse:
+            if tavolo == NESSUNA: v = self._valore(m0 ^ BIT[c] if massimizza else m0, m1 if massimizza else m1 ^ BIT[c], c, 1 - turno, mazzo, alfa, beta)
+            else: v = self._dopo_giocata(m0, m1, tavolo, turno, mazzo, c, alfa, beta)
+            if massimizza:
+                if v > migliore:
+                    migliore = v; migliore_carta = c
+                    if v > alfa: alfa = v
+            elif v < migliore:
+                migliore = v; migliore_carta = c
+                if v < beta: beta = v
+            if alfa >= beta: break
+        if migliore <= alfa_iniziale: alto = migliore
+        elif migliore >= beta_iniziale: basso = migliore
+        else: basso = alto = migliore
+        self._tabella[posto] = chiave << 20 | (migliore_carta + 1) << 14 | alto << 7 | basso
+        return migliore
+
+    def _due_carte(self, m0, m1, turno):
+        """Due carte a testa, tavolo vuoto e mazzo finito: le quattro prime prese in chiaro, l'ultima è forzata.
+        Sono la gran parte delle foglie della ricerca e così non passano né dalla ricorsione né dalla tabella."""
+        self.nodi += 1; vince = self._vince
+        a1, a2 = _carte_mano(m0 if turno == 0 else m1); b1, b2 = _carte_mano(m1 if turno == 0 else m0) # a: chi è di mano
+        migliore = -1
+        for a, altra_a in ((a1, a2), (a2, a1)):
+            risposta = 121 # Chi risponde minimizza i punti di chi è di mano
+            for b, altra_b in ((b1, b2), (b2, b1)):
+                indice = a * NUM_CARTE + b
+                if vince[indice]: punti = PUNTI_PRESA[indice]; ultima = altra_a * NUM_CARTE + altra_b; vince_a = vince[ultima]
+                else: punti = 0; ultima = altra_b * NUM_CARTE + altra_a; vince_a = not vince[ultima]
+                if vince_a: punti += PUNTI_PRESA[ultima]
+                if punti < risposta: risposta = punti
+            if risposta > migliore: migliore = risposta
+        return migliore if turno == 0 else PUNTI_PRESA[a1 * NUM_CARTE + a2] + PUNTI_PRESA[b1 * NUM_CARTE + b2] - migliore
+
+    def _tre_carte(self, m0, m1, turno, alfa, beta):
+        """Tre carte a testa, tavolo vuoto e mazzo finito: alfa-beta sulle nove prime prese, poi _due_carte."""
+        vince = self._vince; due_carte = self._due_carte; massimizza = turno == 0
+        migliore = -1 if massimizza else 121
+        for a in _carte_mano(m0 if massimizza else m1):
+            risposta = 121 if massimizza else -1
+            for b in _carte_mano(m1 if massimizza else m0):
+                indice = a * NUM_CARTE + b; vincitore = turno if vince[indice] else 1 - turno
+                if massimizza: v = due_carte(m0 ^ BIT[a], m1 ^ BIT[b], vincitore)
+                else: v = due_carte(m0 ^ BIT[b], m1 ^ BIT[a], vincitore)
+                if vincitore == 0: v += PUNTI_PRESA[indice]
+                if massimizza:
+                    if v < risposta:
+                        risposta = v
+                        if risposta <= alfa: break
+                elif v > risposta:
+                    risposta = v
+                    if risposta >= beta: break
+            if massimizza:
+                if risposta > migliore:
+                    migliore = risposta
+                    if migliore > alfa: alfa = migliore
+            elif risposta < migliore:
+                migliore = risposta
+                if migliore < beta: beta = migliore
+            if alfa >= beta: break
+        return migliore
+
+def _mazzo_intero(sequenza):
+    """Il mazzo dall'alto come intero, 6 bit per carta (carta + 1) a partire dai bit bassi: 0 è il mazzo vuoto."""
+    valore = 0
+    for c in reversed(sequenza): valore = valore << 6 | (c + 1)
+    return valore
+
+# Nel finale le mani non superano mai tre carte: i loro elenchi si preparano una volta sola all'import
+_ELENCHI = {maschera(scelta): scelta for n in (1, 2, 3) for scelta in combinations(range(NUM_CARTE), n)}
+def _carte_mano(m):
+    """motore.carte per le mani del finale, dagli elenchi già pronti."""
+    elenco = _ELENCHI.get(m)
+    return carte(m) if elenco is None else elenco
+
+_risolutore = RisolutoreFinale()
+
+def politica_finale(stato, giocatore):
+    """Maestro fino alle ultime pescate, poi il risolutore esatto."""
+    mano = carte(stato.mani[giocatore])
+    scelta = _risolutore.scegli(mano, stato.tavolo, stato.briscola, stato.carta_briscola, stato.uscite, stato.carte_nel_mazzo())
+    return scelta if scelta != NESSUNA else ia.politica_maestro(stato, giocatore)
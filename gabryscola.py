@@ -3,13 +3,14 @@
 
 import random, datetime
 import time
-import json
 import math
 from datetime import date
 from collections import namedtuple
+import motore, ia, finale, montecarlo, riflessione, cache_decisioni, classifica_db, registro_binario, profilazione
 
 # --- Costanti e Funzioni Globali ---
-CLASSIFICA_FILE = "briscola_charts.json"
+CLASSIFICA_FILE = "briscola_charts.json" # Vecchia classifica, importata una volta sola nell'archivio SQLite
+CLASSIFICA_DB = "briscola_charts.db"
 CLASSIFICA_MAX_VOCI = 30
 LOG_FILE = "briscola_log.txt"
 
@@ -21,30 +22,13 @@ def generate_ai_name():
     return f"IA-{formatted_part}"
 
 # --- Funzioni di Gestione Classifica ---
-def load_classifica():
-    try:
-        with open(CLASSIFICA_FILE, 'r') as f: return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError): return []
-
-def save_classifica(classifica):
-    with open(CLASSIFICA_FILE, 'w') as f: json.dump(classifica, f, indent=4)
-
-def update_and_display_classifica(classifica, winner_name, wins, ties, losses, total_points):
-    new_entry = {
-        "nome": winner_name, "wins": wins, "ties": ties, "losses": losses,
-        "punti_totali": total_points, "data": date.today().strftime("%d/%m/%Y")
-    }
-    classifica.append(new_entry)
-    
-    def get_sort_key(entry):
-        w = entry.get('wins', 0); t = entry.get('ties', 0); l = entry.get('losses', 0)
-        p = entry.get('punti_totali', 0)
-        match_points = (w * 1.0) + (t * 0.5)
-        return (match_points, w, -l, p)
+def update_and_display_classifica(winner_name, wins, ties, losses, total_points):
+    """Registra il risultato nell'archivio (tutto lo storico, in una transazione) e mostra le prime CLASSIFICA_MAX_VOCI."""
+    with classifica_db.ClassificaDB(CLASSIFICA_DB) as db:
+        db.importa_json(CLASSIFICA_FILE)
+        db.registra(winner_name, wins, ties, losses, total_points, date.today().strftime("%d/%m/%Y"))
+        classifica = db.migliori(CLASSIFICA_MAX_VOCI)
 
-    classifica.sort(key=get_sort_key, reverse=True)
-    classifica = classifica[:CLASSIFICA_MAX_VOCI]
-    
     print("\n" + "="*72); print(" " * 30 + "CLASSIFICA" + " " * 32); print("="*72)
     print(f"{'Pos.':<5}{'Nome':<20}{'Risultato (V-P-S)':<20}{'Punti Tot.':<12}{'Data'}"); print("-" * 72)
     for i, entry in enumerate(classifica, 1):
@@ -58,35 +42,51 @@ def update_and_display_classifica(classifica, winner_name, wins, ties, losses, t
     print("-" * 72)
     return classifica
 
+# --- IA di primo livello, usabile anche fuori da Briscola (server, processi di lavoro) ---
+def carta_maestro(posizione, carta_briscola, risolutore_finale=None, pesi=ia.PESI_MAESTRO):
+    """(carta, valore, carte pari) dell'IA maestro per una posizione di Briscola._posizione_ia: l'euristica gira sul motore
+    a interi (ia.scelta_maestro_pari); nelle ultime pescate e a mazzo finito decide il risolutore esatto, che non dà una valutazione."""
+    mano_pc, carta_tavolo, seme_briscola, uscite, carte_nel_mazzo = posizione
+    if risolutore_finale:
+        scelta = risolutore_finale.scegli(mano_pc, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo)
+        if scelta != motore.NESSUNA: return scelta, None, ()
+    incognite = motore.TUTTE & ~uscite & ~motore.maschera(mano_pc)
+    return ia.scelta_maestro_pari(mano_pc, carta_tavolo, seme_briscola, incognite, carte_nel_mazzo, pesi)
+
 class Mazzo:
     import random; from collections import namedtuple
-    Carta = namedtuple("Carta", ["id", "nome", "valore", "seme_nome", "seme_id", "desc_breve"])
-    PUNTI_BRISCOLA = {1: 11, 3: 10, 10: 4, 9: 3, 8: 2}
+    Carta = namedtuple("Carta", ["id", "nome", "valore", "seme_nome", "seme_id", "desc_breve", "indice"]) # indice: intero 0-39 del motore
+    PUNTI_BRISCOLA = motore.PUNTI_BRISCOLA
     _SEMI_ITALIANI = ["Bastoni", "Spade", "Coppe", "Denari"]
     _VALORI_ITALIANI = [("Asso", 1), ('2', 2), ('3', 3), ('4', 4), ('5', 5), ('6', 6), ('7', 7), ("Fante", 8), ("Cavallo", 9), ("Re", 10)]
     _VALORI_DESCRIZIONE = {1: 'A', 2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9', 10: '0'}
     _SEMI_DESCRIZIONE = {"Bastoni": 'B', "Spade": 'S', "Coppe": 'C', "Denari": 'D'}
-    def __init__(self): self.carte = []; self._costruisci_mazzo()
-    def _costruisci_mazzo(self):
-        self.carte = []
-        for id_seme, nome_seme in enumerate(self._SEMI_ITALIANI, 1):
-            for nome_valore, valore_num in self._VALORI_ITALIANI:
-                desc_val = self._VALORI_DESCRIZIONE.get(valore_num, '?'); desc_seme = self._SEMI_DESCRIZIONE.get(nome_seme, '?')
+    CARTE = () # Le 40 Carta, costruite una volta sola; CARTE[i] è la vista della carta i del motore
+    def __init__(self): self.carte = list(self.CARTE); self._cursore = 0
+    @classmethod
+    def _costruisci_mazzo(cls):
+        carte = []
+        for id_seme, nome_seme in enumerate(cls._SEMI_ITALIANI, 1):
+            for nome_valore, valore_num in cls._VALORI_ITALIANI:
+                desc_val = cls._VALORI_DESCRIZIONE.get(valore_num, '?'); desc_seme = cls._SEMI_DESCRIZIONE.get(nome_seme, '?')
                 desc_breve = f"{desc_val}{desc_seme}"; nome_completo = f"{nome_valore} di {nome_seme}"
-                self.carte.append(self.Carta(id=valore_num*10+id_seme, nome=nome_completo, valore=valore_num, seme_nome=nome_seme, seme_id=id_seme, desc_breve=desc_breve))
-    def mescola_mazzo(self): self.random.shuffle(self.carte)
-    def pesca(self, quante=1): return [self.carte.pop(0) for _ in range(min(quante, len(self.carte)))]
-    def __len__(self): return len(self.carte)
+                carte.append(cls.Carta(id=valore_num*10+id_seme, nome=nome_completo, valore=valore_num, seme_nome=nome_seme, seme_id=id_seme, desc_breve=desc_breve, indice=len(carte)))
+        return tuple(carte)
+    def mescola_mazzo(self): self.random.shuffle(self.carte); self._cursore = 0
+    def pesca(self, quante=1):
+        # Il cursore evita il pop(0): carte contiene anche quelle già pescate
+        pescate = self.carte[self._cursore:self._cursore + quante]; self._cursore += len(pescate); return pescate
+    def __len__(self): return len(self.carte) - self._cursore
+Mazzo.CARTE = Mazzo._costruisci_mazzo()
 
 class Giocatore:
     def __init__(self, nome): self.nome = nome; self.mano = []; self.mazzetto = []
-    def calcola_punteggio(self): return sum(Mazzo.PUNTI_BRISCOLA.get(carta.valore, 0) for carta in self.mazzetto)
+    def calcola_punteggio(self): return sum(motore.PUNTI[carta.indice] for carta in self.mazzetto)
 
 class Briscola:
     VERSIONE = "1.1.3 del 5 ottobre 2025 by Gabriele Battaglia (IZ4APU) & AI"
 
     def __init__(self, nome_giocatore_umano):
-        self.mazzo_completo = Mazzo().carte[:]
         self.mazzo = Mazzo()
         self.giocatore_umano = Giocatore(nome_giocatore_umano)
         self.giocatore_pc = Giocatore(generate_ai_name())
@@ -95,12 +95,28 @@ class Briscola:
         self.log_attivo = False
         self.prompt_attivo = True
         self.log_partita = []
-    def _get_valore_comparativo(self, carta): return Mazzo.PUNTI_BRISCOLA.get(carta.valore, 0) * 10 + carta.valore
+        self.file_log = None # Se aperto, il log si scrive man mano invece di restare in log_partita
+        self.registro = None # registro_binario.ScrittoreRegistro per salvare ogni partita in formato binario
+        self._ordine = []; self._giocate = [] # Mazzo mescolato e carte giocate della partita in corso, come indici del motore
+        self.risolutore_finale = finale.RisolutoreFinale() # None per giocare il finale con la sola euristica
+        self.ia_montecarlo = None # Un montecarlo.MonteCarlo sceglie il secondo livello di IA
+        self.pesi = ia.PESI_MAESTRO; self.profilo = None # Pesi dell'euristica, o quelli di un profilo della taratura
+        self.riflessione_attiva = True # L'IA prepara le risposte mentre il giocatore pensa
+        self.riflessione = None; self._risposte_pronte = {}
+        self.cache_decisioni = None # La crea carica_libro, se c'è un libro o gioca il Monte Carlo
+    def _get_valore_comparativo(self, carta): return motore.FORZA[carta.indice]
 
     def _log(self, messaggio):
-        """Se la modalità log è attiva, aggiunge un messaggio alla lista."""
+        """Se la modalità log è attiva, scrive il messaggio nel file di log, o lo aggiunge alla lista se non c'è un file."""
         if self.log_attivo:
-            self.log_partita.append(messaggio)
+            if self.file_log: self.file_log.write(messaggio + "\n")
+            else: self.log_partita.append(messaggio)
+
+    def _registra_partita(self, di_mano, abbandonata=False):
+        """Aggiunge la partita appena finita (o abbandonata) al registro binario, se ce n'è uno."""
+        if self.registro:
+            punti = (self.giocatore_umano.calcola_punteggio(), self.giocatore_pc.calcola_punteggio())
+            self.registro.scrivi(0, self._ordine, self._giocate, di_mano, punti, abbandonata)
     def _decidi_primo_giocatore_match(self):
         print("\n--- Si decide chi inizia il match ---")
         mazzo_temp = Mazzo(); mazzo_temp.mescola_mazzo()
@@ -112,28 +128,41 @@ class Briscola:
             self.primo_giocatore_del_match = self.giocatore_pc; print(f"{self.giocatore_pc.nome} ha la carta più alta, inizia lui.")
         print("-------------------------------------\n"); time.sleep(.5)
 
-    def _reset_e_prepara_partita(self):
-        self.mazzo = Mazzo(); self.mazzo.mescola_mazzo()
+    def _prepara_partita(self, rng=None):
+        """Mescola e distribuisce senza stampare nulla. rng (random.Random) rende la smazzata riproducibile."""
+        self.mazzo = Mazzo()
+        if rng is None: self.mazzo.mescola_mazzo()
+        else: rng.shuffle(self.mazzo.carte)
+        self._ordine = [c.indice for c in self.mazzo.carte]; self._giocate = []
         self.giocatore_umano.mano, self.giocatore_umano.mazzetto = [], []
         self.giocatore_pc.mano, self.giocatore_pc.mazzetto = [], []
-        self.carte_uscite = set()
+        self.carte_uscite = set(); self.tavolo = []; self._risposte_pronte = {}
         self.giocatore_umano.mano = self.mazzo.pesca(3); self.giocatore_pc.mano = self.mazzo.pesca(3)
         self.briscola = self.mazzo.pesca(1)[0]; self.mazzo.carte.append(self.briscola)
+
+    def _reset_e_prepara_partita(self):
+        self._prepara_partita()
         print(f"La carta Briscola è: {self.briscola.nome}")
         self._log(f"BRISCOLA {self.briscola.desc_breve}") # <-- AGGIUNGI QUESTA RIGA
 
     def _stampa_prompt_giocatore(self):
         mano_estesa_str = "Tu hai: "+". ".join([c.nome for c in self.giocatore_umano.mano]) + "."
         print(mano_estesa_str)
-        if self.prompt_attivo:
-            carte_rimaste = len(self.mazzo); briscola_breve = self.briscola.desc_breve
-            tavolo_breve = self.tavolo[0].desc_breve if self.tavolo else "-"
-            punti_tuoi = self.giocatore_umano.calcola_punteggio(); punti_pc = self.giocatore_pc.calcola_punteggio()
-            punti_str = f"{punti_tuoi}/{punti_pc}"; mano_str = " ".join([c.desc_breve for c in self.giocatore_umano.mano])
-            prompt = f"R{carte_rimaste} B{briscola_breve} T{tavolo_breve} P{punti_str} - C {mano_str} > "
-        else:
-            prompt = "> " # Se noprompt è attivo, mostra solo un cursore
+        prompt = self._testo_prompt() if self.prompt_attivo else "> " # Se noprompt è attivo, mostra solo un cursore
+
+        self._avvia_riflessione()
+        try: return self._leggi_scelta_giocatore(prompt)
+        finally: self._ferma_riflessione()
 
+    def _testo_prompt(self):
+        """Il prompt compatto: carte Rimaste, Briscola, carta sul Tavolo, Punti tuoi/IA e le tue Carte."""
+        carte_rimaste = len(self.mazzo); briscola_breve = self.briscola.desc_breve
+        tavolo_breve = self.tavolo[0].desc_breve if self.tavolo else "-"
+        punti_tuoi = self.giocatore_umano.calcola_punteggio(); punti_pc = self.giocatore_pc.calcola_punteggio()
+        punti_str = f"{punti_tuoi}/{punti_pc}"; mano_str = " ".join([c.desc_breve for c in self.giocatore_umano.mano])
+        return f"R{carte_rimaste} B{briscola_breve} T{tavolo_breve} P{punti_str} - C {mano_str} > "
+
+    def _leggi_scelta_giocatore(self, prompt):
         while True:
             try:
                 scelta = input(prompt)
@@ -153,52 +182,92 @@ class Briscola:
                 else: print(f"Scelta non valida. Inserisci un numero tra 1 e {len(self.giocatore_umano.mano)}")
             except (ValueError, IndexError): print("Input non valido. Inserisci il numero della carta che vuoi giocare.")
     def _determina_vincitore_mano(self, carta1, giocatore1, carta2, giocatore2):
-        c1_briscola = carta1.seme_nome == self.briscola.seme_nome; c2_briscola = carta2.seme_nome == self.briscola.seme_nome
-        if c1_briscola and not c2_briscola: return giocatore1
-        if not c1_briscola and c2_briscola: return giocatore2
-        if c1_briscola and c2_briscola or carta1.seme_nome == carta2.seme_nome:
-            return giocatore1 if self._get_valore_comparativo(carta1) > self._get_valore_comparativo(carta2) else giocatore2
-        return giocatore1
+        # Tabella precalcolata per seme di briscola (motore.VINCE_PRIMA)
+        return giocatore1 if motore.VINCE_PRIMA[self.briscola.seme_id - 1][carta1.indice * motore.NUM_CARTE + carta2.indice] else giocatore2
     
+    def _posizione_ia(self):
+        """La partita vista dall'IA sul motore a interi: (mano, carta sul tavolo, seme di briscola, carte uscite, carte nel mazzo)."""
+        mano_pc = tuple(c.indice for c in self.giocatore_pc.mano)
+        carta_tavolo = self.tavolo[0].indice if self.tavolo else motore.NESSUNA
+        uscite = motore.maschera(c.indice for c in self.carte_uscite)
+        return mano_pc, carta_tavolo, self.briscola.seme_id - 1, uscite, len(self.mazzo)
+
+    @property
+    def livello_ia(self):
+        if self.ia_montecarlo: return "montecarlo"
+        return f"profilo:{self.profilo}" if self.profilo else "maestro"
+
+    def usa_profilo(self, nome, pesi):
+        """L'IA maestro gioca con i pesi di un profilo salvato da taratura.py."""
+        self.profilo = nome; self.pesi = pesi
+
+    def carica_libro(self, percorso=cache_decisioni.LIBRO_FILE):
+        """Carica nella cache il libro delle aperture, se c'è ed è stato costruito con lo stesso livello di IA.
+        La cache resta solo col libro o col Monte Carlo: per il maestro cercare una posizione costa quanto deciderla."""
+        cache = self.cache_decisioni if self.cache_decisioni is not None else cache_decisioni.CacheDecisioni()
+        voci = cache.carica(percorso, self.livello_ia)
+        if voci or self.ia_montecarlo: self.cache_decisioni = cache
+        return voci
+
+    def _carta_ia(self, posizione, stop=None, rapida=False):
+        """Intero della carta che l'IA giocherebbe nella posizione data, senza toccare la mano.
+        rapida riduce il budget del Monte Carlo per il primo giro della riflessione: quelle scelte non entrano in cache.
+        Il maestro consulta solo il libro: ricordare le sue scelte costerebbe più che rifarle."""
+        mano_pc, carta_tavolo, seme_briscola, uscite, carte_nel_mazzo = posizione
+        argomenti = (mano_pc, carta_tavolo, seme_briscola, self.briscola.indice, uscite, carte_nel_mazzo)
+        usa_cache = self.cache_decisioni is not None and not rapida and not self._decide_il_risolutore(carte_nel_mazzo)
+        if usa_cache:
+            trovata = self.cache_decisioni.cerca(*argomenti)
+            if trovata: return trovata[0]
+        if not self.ia_montecarlo: return self._carta_maestro(posizione)[0]
+        budget = self.ia_montecarlo.budget_secondi / 5 if rapida else None
+        carta, valore = self.ia_montecarlo.scegli_valutata(*argomenti, stop, budget)
+        if usa_cache and not (stop and stop.is_set()): self.cache_decisioni.memorizza(*argomenti, carta, valore)
+        return carta
+
+    def _decide_il_risolutore(self, carte_nel_mazzo):
+        """Vero se la scelta spetta al risolutore esatto del finale: una voce di libro non deve scavalcarlo."""
+        risolutore = montecarlo._risolutore if self.ia_montecarlo else self.risolutore_finale
+        return bool(risolutore) and risolutore.applicabile(carte_nel_mazzo)
+
+    def _carta_maestro(self, posizione):
+        return carta_maestro(posizione, self.briscola.indice, self.risolutore_finale, self.pesi)
+
+    def _scelta_computer(self):
+        """Sceglie e toglie dalla mano la carta dell'IA, usando la risposta preparata durante la riflessione se c'è."""
+        posizione = self._posizione_ia()
+        scelta = self._risposte_pronte.get(posizione)
+        if scelta is None: scelta = self._carta_ia(posizione)
+        return self.giocatore_pc.mano.pop(posizione[0].index(scelta))
+
     def _scelta_computer_maestro(self):
-        mano_pc = self.giocatore_pc.mano; is_briscola = lambda c: c.seme_nome == self.briscola.seme_nome; punti_carta = lambda c: Mazzo.PUNTI_BRISCOLA.get(c.valore, 0)
-        if self.tavolo:
-            carta_avversario = self.tavolo[0]; mosse_valutate = []
-            for carta_da_giocare in mano_pc:
-                vincitore = self._determina_vincitore_mano(carta_avversario, self.giocatore_umano, carta_da_giocare, self.giocatore_pc)
-                punti_mano = punti_carta(carta_avversario) + punti_carta(carta_da_giocare)
-                valore = punti_mano if vincitore == self.giocatore_pc else -punti_mano
-                if vincitore == self.giocatore_pc:
-                    if is_briscola(carta_da_giocare) and not is_briscola(carta_avversario) and punti_mano < 10: valore -= 20
-                else: valore -= punti_carta(carta_da_giocare) * 5
-                mosse_valutate.append((valore, carta_da_giocare))
-            _, carta_scelta = max(mosse_valutate, key=lambda x: x[0])
-        else:
-            carte_incognite = list(set(self.mazzo_completo) - self.carte_uscite - set(mano_pc)); num_carte_incognite = len(carte_incognite)
-            briscole_incognite = [c for c in carte_incognite if is_briscola(c)]; mosse_valutate = []
-            for carta_da_giocare in mano_pc:
-                punti_da_rischiare = punti_carta(carta_da_giocare); valore_atteso_punti = 0; vittorie_stimate = 0
-                if num_carte_incognite > 0:
-                    for carta_avv_potenziale in carte_incognite:
-                        vincitore = self._determina_vincitore_mano(carta_da_giocare, self.giocatore_pc, carta_avv_potenziale, self.giocatore_umano)
-                        punti_mano = punti_da_rischiare + punti_carta(carta_avv_potenziale)
-                        if vincitore == self.giocatore_pc: valore_atteso_punti += punti_mano; vittorie_stimate += 1
-                        else: valore_atteso_punti -= punti_mano
-                    valore_medio_punti = valore_atteso_punti / num_carte_incognite; prob_vittoria = vittorie_stimate / num_carte_incognite
-                else: valore_medio_punti, prob_vittoria = punti_da_rischiare, 1.0
-                rischio = 0
-                if punti_da_rischiare > 0 and not is_briscola(carta_da_giocare) and num_carte_incognite > 0:
-                    prob_di_essere_briscolata = len(briscole_incognite) / num_carte_incognite
-                    rischio = prob_di_essere_briscolata * punti_da_rischiare * 30
-                costo_opportunita = 0
-                if is_briscola(carta_da_giocare) and punti_da_rischiare > 3: costo_opportunita = (punti_da_rischiare + 5) * (len(self.mazzo) / 10)
-                VANTAGGIO_MANO_SUCCESSIVA = 1.5
-                valore_tattico = (1 - prob_vittoria) * VANTAGGIO_MANO_SUCCESSIVA - prob_vittoria * VANTAGGIO_MANO_SUCCESSIVA
-                valore_finale = valore_medio_punti - rischio - costo_opportunita + valore_tattico
-                mosse_valutate.append((valore_finale, carta_da_giocare))
-            _, carta_scelta = max(mosse_valutate, key=lambda x: x[0])
-        mano_pc.remove(carta_scelta)
-        return carta_scelta
+        """Sceglie e toglie dalla mano la carta dell'IA di primo livello."""
+        posizione = self._posizione_ia()
+        return self.giocatore_pc.mano.pop(posizione[0].index(self._carta_maestro(posizione)[0]))
+
+    def _avvia_riflessione(self):
+        """Se il giocatore apre la mano, l'IA prepara in un thread la risposta a ogni carta che potrebbe avere:
+        quelle non uscite, non in mano all'IA e non la briscola scoperta in fondo al mazzo."""
+        self._risposte_pronte = {}
+        if not self.riflessione_attiva or self.tavolo or not self.giocatore_pc.mano: return
+        mano_pc, _, seme_briscola, uscite, carte_nel_mazzo = self._posizione_ia()
+        fondo = motore.BIT[self.briscola.indice] if carte_nel_mazzo > 0 else 0
+        possibili = motore.carte(motore.TUTTE & ~uscite & ~motore.maschera(mano_pc) & ~fondo)
+        possibili.sort(key=lambda c: (c // 10 == seme_briscola, motore.PUNTI[c])) # Prima i lisci, poi carichi e briscole
+        posizioni = [(mano_pc, c, seme_briscola, uscite, carte_nel_mazzo) for c in possibili]
+        self.riflessione = riflessione.Riflessione(self._carta_ia, posizioni, self._posizioni_successive, passata_rapida=bool(self.ia_montecarlo)).avvia()
+
+    def _posizioni_successive(self, risposte):
+        """A mazzo finito la mano seguente è nota: se l'IA prende, prepara anche la sua prossima apertura."""
+        for (mano_pc, carta_tavolo, seme_briscola, uscite, carte_nel_mazzo), risposta in risposte.items():
+            if carte_nel_mazzo > 0 or len(mano_pc) < 2: continue
+            if motore.VINCE_PRIMA[seme_briscola][carta_tavolo * motore.NUM_CARTE + risposta]: continue
+            resto = tuple(c for c in mano_pc if c != risposta)
+            yield resto, motore.NESSUNA, seme_briscola, uscite | motore.BIT[carta_tavolo] | motore.BIT[risposta], 0
+
+    def _ferma_riflessione(self):
+        if self.riflessione:
+            self._risposte_pronte = self.riflessione.ferma(); self.riflessione = None
 
     # Sostituisci interamente la funzione gioca_partita
 
@@ -206,6 +275,7 @@ class Briscola:
         self._reset_e_prepara_partita()
         print(f"\n--- Inizia la partita! Il primo a giocare è {giocatore_di_mano.nome}. ---")
         self._log(f"INIZIO_PARTITA MANO_A {giocatore_di_mano.nome}")
+        di_mano_iniziale = 0 if giocatore_di_mano == self.giocatore_umano else 1 # Nel motore il giocatore 0 è l'umano
         
         mano_n = 1
         while len(self.giocatore_umano.mazzetto) + len(self.giocatore_pc.mazzetto) < 40:
@@ -223,16 +293,18 @@ class Briscola:
             giocatori = (self.giocatore_umano, self.giocatore_pc) if giocatore_di_mano == self.giocatore_umano else (self.giocatore_pc, self.giocatore_umano)
             
             for giocatore in giocatori:
-                carta = self._stampa_prompt_giocatore() if giocatore == self.giocatore_umano else self._scelta_computer_maestro()
+                carta = self._stampa_prompt_giocatore() if giocatore == self.giocatore_umano else self._scelta_computer()
                 
-                if carta == "FORFEIT": return "FORFEIT", 0, 0
+                if carta == "FORFEIT":
+                    self._registra_partita(di_mano_iniziale, abbandonata=True)
+                    return "FORFEIT", 0, 0
 
                 print(f"{giocatore.nome} gioca: {carta.nome}")
                 self._log(f"GIOCA {giocatore.nome} {carta.desc_breve}")
-                self.tavolo.append(carta)
+                self.tavolo.append(carta); self._giocate.append(carta.indice)
 
             vincitore_mano = self._determina_vincitore_mano(self.tavolo[0], giocatori[0], self.tavolo[1], giocatori[1])
-            punti_presi = sum(Mazzo.PUNTI_BRISCOLA.get(c.valore, 0) for c in self.tavolo)
+            punti_presi = sum(motore.PUNTI[c.indice] for c in self.tavolo)
             vincitore_mano.mazzetto.extend(self.tavolo); self.carte_uscite.update(self.tavolo)
             
             print(f"{vincitore_mano.nome} vince la mano e prende {punti_presi} punti.")
@@ -248,6 +320,7 @@ class Briscola:
         punti_umano = self.giocatore_umano.calcola_punteggio(); punti_pc = self.giocatore_pc.calcola_punteggio()
         print("\n" + "="*40 + "\nPARTITA TERMINATA!\n" + "="*40); print(f"PUNTEGGIO PARTITA:\n   - {self.giocatore_umano.nome}: {punti_umano} punti\n   - {self.giocatore_pc.nome}: {punti_pc} punti")
         self._log(f"\nFINALE {self.giocatore_umano.nome} {punti_umano} - {self.giocatore_pc.nome} {punti_pc}")
+        self._registra_partita(di_mano_iniziale)
         
         if punti_umano > 60: return (self.giocatore_umano, punti_umano, punti_pc)
         elif punti_umano == 60: return (None, punti_umano, punti_pc)
@@ -339,9 +412,7 @@ class Briscola:
         if vincitore_match:
             print(f"🎉🎉🎉 {vincitore_match.nome.upper()} HAI VINTO IL MATCH{motivo_vittoria}! 🎉🎉🎉")
             res_vincitore = risultati[vincitore_match.nome]
-            classifica = load_classifica()
-            classifica_aggiornata = update_and_display_classifica(classifica, vincitore_match.nome, res_vincitore['wins'], res_vincitore['ties'], res_vincitore['losses'], punti_totali[vincitore_match.nome])
-            save_classifica(classifica_aggiornata)
+            update_and_display_classifica(vincitore_match.nome, res_vincitore['wins'], res_vincitore['ties'], res_vincitore['losses'], punti_totali[vincitore_match.nome])
             print("\nClassifica salvata. Grazie per aver giocato!")
         else: print("Incredibile! Il match è finito in PATTA ASSOLUTA, anche nei punti totali!")
 
@@ -350,10 +421,11 @@ class Briscola:
 if __name__ == "__main__":
     log_enabled = False
     prompt_enabled = True
+    profile_enabled = False
     nome_giocatore = ""
 
     print(f"Gabryscola v{Briscola.VERSIONE}")
-    print("Digita 'logon' per attivare la modalità di debug o 'noprompt' per nascondere i prompt.")
+    print("Digita 'logon' per attivare la modalità di debug, 'noprompt' per nascondere i prompt o 'profile' per misurare i tempi del gioco.")
 
     while not nome_giocatore:
         nome_input = input("Inserisci il tuo nome per la sfida: ").strip()
@@ -366,6 +438,10 @@ if __name__ == "__main__":
             prompt_enabled = False
             print(">>> Modalità NOPROMPT attivata. I prompt verranno nascosti. Reinserisci il tuo nome. <<<")
             continue
+        elif nome_input.lower() == 'profile':
+            profile_enabled = True
+            print(">>> Modalità PROFILE attivata. A fine match vedrai i tempi del gioco. Reinserisci il tuo nome. <<<")
+            continue
         
         if not nome_input:
             print("Il nome non può essere vuoto. Riprova.")
@@ -380,21 +456,48 @@ if __name__ == "__main__":
             if 1 <= numero_partite <= 11: break
             else: print("Per favore, inserisci un numero da 1 a 11.")
         except ValueError: print("Input non valido. Inserisci un numero.")
-            
+
+    # Oltre ai due livelli fissi, ogni profilo salvato da taratura.py è un livello
+    profili = ia.carica_profili(); livelli = ["1", "2"] + [str(i) for i in range(3, 3 + len(profili))]
+    elenco_profili = "".join(f", {i} = {nome}" for i, nome in enumerate(profili, 3))
+    livello_ia = ""
+    while livello_ia not in livelli:
+        livello_ia = input(f"Scegli l'avversario: 1 = Maestro, 2 = Montecarlo (più forte, pensa fino a {montecarlo.BUDGET_SECONDI} secondi){elenco_profili}: ").strip() or "1"
+        if livello_ia not in livelli: print(f"Per favore, inserisci un numero da 1 a {len(livelli)}.")
+
     gioco = Briscola(nome_giocatore_umano=nome_giocatore)
     gioco.log_attivo = log_enabled
     gioco.prompt_attivo = prompt_enabled
+    if livello_ia == "2": gioco.ia_montecarlo = montecarlo.MonteCarlo().avvia() # Processi pronti prima della riflessione
+    elif livello_ia != "1":
+        nome_profilo = list(profili)[int(livello_ia) - 3]; gioco.usa_profilo(nome_profilo, profili[nome_profilo])
+    voci_libro = gioco.carica_libro()
+    if voci_libro: print(f"Libro delle aperture caricato: {voci_libro} posizioni.")
 
-    gioco.avvia_match(numero_partite_match=numero_partite)
-    
-    # RIPRISTINATO il salvataggio del log qui, alla fine del match
+    # Il log si scrive man mano: testo per la lettura, registro binario per le analisi e il replay
     if gioco.log_attivo:
-        timestamp_match = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nome_file = f"log_{gioco.giocatore_umano.nome}_{timestamp_match}.txt"
-        with open(nome_file, 'w', encoding='utf-8') as f:
-            f.write(f"Log Match del {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-            f.write("="*40 + "\n")
-            f.write('\n'.join(gioco.log_partita))
-        print(f"\nLog del match salvato nel file: {nome_file}")
+        adesso = datetime.datetime.now() # FIX: datetime è il modulo, non la classe
+        nome_file = f"log_{gioco.giocatore_umano.nome}_{adesso.strftime('%Y%m%d_%H%M%S')}"
+        gioco.file_log = open(nome_file + ".txt", 'w', encoding='utf-8')
+        gioco.file_log.write(f"Log Match del {adesso.strftime('%d/%m/%Y %H:%M:%S')}\n" + "="*40 + "\n")
+        gioco.registro = registro_binario.ScrittoreRegistro(nome_file + ".gbr")
+
+    # Con la modalità spenta non si installa nulla: le funzioni del gioco restano quelle originali
+    profilatore = profilazione.Profilatore().installa(Briscola, Mazzo) if profile_enabled else None
+    if profilatore: profilatore.avvia_profilo()
+
+    try:
+        gioco.avvia_match(numero_partite_match=numero_partite)
+    finally:
+        if profilatore:
+            profilatore.ferma_profilo(); profilatore.disinstalla()
+            print("\n" + "\n".join(profilatore.riepilogo(gioco.cache_decisioni)))
+            if input("Salvare i file per i flamegraph (cProfile e pile)? (s/n): ").lower().strip() == 's':
+                nome_profilo = f"profilo_{gioco.giocatore_umano.nome}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                print("File salvati: " + ", ".join(profilatore.salva(nome_profilo)) + ".")
+        if gioco.ia_montecarlo: gioco.ia_montecarlo.chiudi()
+        if gioco.log_attivo:
+            gioco.file_log.close(); gioco.registro.chiudi()
+            print(f"\nLog del match salvato nei file: {nome_file}.txt e {nome_file}.gbr")
 
     input("\nPremi Invio per uscire...")
\ No newline at end of file
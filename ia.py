@@ -0,0 +1,103 @@
+# GABRYSCOLA - Intelligenza artificiale sul motore a interi
+# Le politiche ricevono (stato, giocatore) e restituiscono l'intero della carta da giocare, senza toccare lo stato.
+
+import json
+from collections import namedtuple
+
+from motore import NUM_CARTE, NESSUNA, TUTTE, PUNTI, VINCE_PRIMA, MASCHERA_SEME, carte
+
+# I pesi dell'euristica maestro. Quando l'IA risponde: penalita_briscola per chi usa una briscola su una mano
+# da meno di 10 punti, scarto_punti volte i punti della carta ceduta. Quando apre: rischio volte i punti esposti
+# alle briscole incognite, (punti + base_opportunita) * (carte nel mazzo / scala_opportunita) per chi spende una
+# briscola carica, vantaggio_mano per il valore di restare (o non restare) di mano.
+Pesi = namedtuple("Pesi", ["penalita_briscola", "scarto_punti", "rischio", "base_opportunita", "scala_opportunita", "vantaggio_mano"])
+PESI_MAESTRO = Pesi(20, 5, 30, 5, 10, 1.5)
+PROFILI_FILE = "briscola_profili.json"
+
+def scelta_maestro(mano, carta_tavolo, seme_briscola, incognite, carte_nel_mazzo, pesi=PESI_MAESTRO):
+    """Euristica a un livello di Briscola._scelta_computer_maestro.
+    mano è la sequenza delle carte nell'ordine della mano (a parità di valore vince la prima),
+    incognite la maschera delle carte non ancora viste, usata solo quando l'IA è di mano."""
+    return scelta_maestro_valutata(mano, carta_tavolo, seme_briscola, incognite, carte_nel_mazzo, pesi)[0]
+
+def scelta_maestro_valutata(mano, carta_tavolo, seme_briscola, incognite, carte_nel_mazzo, pesi=PESI_MAESTRO):
+    """Come scelta_maestro, ma restituisce (carta, valore della carta)."""
+    if carta_tavolo != NESSUNA: valori = valuta_risposte(mano, carta_tavolo, seme_briscola, pesi)
+    else: valori = valuta_aperture(mano, seme_briscola, incognite, carte_nel_mazzo, pesi)
+    valore_migliore = max(valori)
+    return mano[valori.index(valore_migliore)], valore_migliore
+
+def scelta_maestro_pari(mano, carta_tavolo, seme_briscola, incognite, carte_nel_mazzo, pesi=PESI_MAESTRO):
+    """Come scelta_maestro_valutata, più le carte della mano che valgono quanto la scelta (lei compresa):
+    chi ricorda la scelta a semi rinumerati può così rompere la parità come l'euristica, con la prima della mano."""
+    if carta_tavolo != NESSUNA: valori = valuta_risposte(mano, carta_tavolo, seme_briscola, pesi)
+    else: valori = valuta_aperture(mano, seme_briscola, incognite, carte_nel_mazzo, pesi)
+    valore_migliore = max(valori)
+    return mano[valori.index(valore_migliore)], valore_migliore, [c for c, v in zip(mano, valori) if v == valore_migliore]
+
+def valuta_risposte(mano, carta_tavolo, seme_briscola, pesi=PESI_MAESTRO):
+    """Valore di ogni carta della mano quando l'IA risponde alla carta_tavolo."""
+    vince = VINCE_PRIMA[seme_briscola]; valori = []
+    punti_tavolo = PUNTI[carta_tavolo]; tavolo_briscola = carta_tavolo // 10 == seme_briscola; riga = carta_tavolo * NUM_CARTE
+    penalita_briscola, scarto_punti = pesi.penalita_briscola, pesi.scarto_punti
+    for c in mano:
+        punti_mano = punti_tavolo + PUNTI[c]
+        if vince[riga + c]: valore = -punti_mano - PUNTI[c] * scarto_punti
+        else:
+            valore = punti_mano
+            if c // 10 == seme_briscola and not tavolo_briscola and punti_mano < 10: valore -= penalita_briscola
+        valori.append(valore)
+    return valori
+
+def valuta_aperture(mano, seme_briscola, incognite, carte_nel_mazzo, pesi=PESI_MAESTRO):
+    """Valore atteso di ogni carta della mano quando l'IA è di mano, contro tutte le carte incognite."""
+    vince = VINCE_PRIMA[seme_briscola]; valori = []; _, _, peso_rischio, base_opportunita, scala_opportunita, vantaggio_mano = pesi
+    carte_incognite = carte(incognite); num_carte_incognite = len(carte_incognite)
+    briscole_incognite = bin(incognite & MASCHERA_SEME[seme_briscola]).count("1")
+    for c in mano:
+        punti_da_rischiare = PUNTI[c]; is_briscola = c // 10 == seme_briscola
+        if num_carte_incognite > 0:
+            valore_atteso_punti = 0; vittorie_stimate = 0; riga = c * NUM_CARTE
+            for u in carte_incognite:
+                punti_mano = punti_da_rischiare + PUNTI[u]
+                if vince[riga + u]: valore_atteso_punti += punti_mano; vittorie_stimate += 1
+                else: valore_atteso_punti -= punti_mano
+            valore_medio_punti = valore_atteso_punti / num_carte_incognite; prob_vittoria = vittorie_stimate / num_carte_incognite
+        else: valore_medio_punti, prob_vittoria = punti_da_rischiare, 1.0
+        rischio = 0
+        if punti_da_rischiare > 0 and not is_briscola and num_carte_incognite > 0:
+            rischio = briscole_incognite / num_carte_incognite * punti_da_rischiare * peso_rischio
+        costo_opportunita = 0
+        if is_briscola and punti_da_rischiare > 3: costo_opportunita = (punti_da_rischiare + base_opportunita) * (carte_nel_mazzo / scala_opportunita)
+        valore_tattico = (1 - prob_vittoria) * vantaggio_mano - prob_vittoria * vantaggio_mano
+        valori.append(valore_medio_punti - rischio - costo_opportunita + valore_tattico)
+    return valori
+
+def incognite_per(stato, giocatore):
+    """Carte che il giocatore non ha ancora visto: né uscite, né in mano, né sul tavolo."""
+    tavolo = 0 if stato.tavolo == NESSUNA else 1 << stato.tavolo
+    return TUTTE & ~stato.uscite & ~stato.mani[giocatore] & ~tavolo
+
+# --- Politiche per StatoPartita ---
+def politica_maestro(stato, giocatore, pesi=PESI_MAESTRO):
+    return scelta_maestro(carte(stato.mani[giocatore]), stato.tavolo, stato.briscola, incognite_per(stato, giocatore), stato.carte_nel_mazzo(), pesi)
+
+def politica_pesi(pesi):
+    """Politica maestro con pesi diversi da quelli predefiniti."""
+    return lambda stato, giocatore: politica_maestro(stato, giocatore, pesi)
+
+# --- Profili: pesi con un nome, salvati dalla taratura e offerti dal gioco come livelli ---
+def carica_profili(percorso=PROFILI_FILE):
+    """{nome: Pesi} dei profili salvati (vuoto se il file manca o è illeggibile)."""
+    try:
+        with open(percorso, 'r') as f: dati = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return {}
+    return {nome: Pesi(**voce["pesi"]) for nome, voce in dati.get("profili", {}).items()}
+
+def salva_profilo(nome, pesi, percorso=PROFILI_FILE, **informazioni):
+    """Aggiunge o sostituisce un profilo; informazioni (punteggio, iterazioni...) si salvano accanto ai pesi."""
+    try:
+        with open(percorso, 'r') as f: dati = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): dati = {"profili": {}}
+    dati.setdefault("profili", {})[nome] = dict(informazioni, pesi=pesi._asdict())
+    with open(percorso, 'w') as f: json.dump(dati, f, indent=4)
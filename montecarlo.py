@@ -0,0 +1,129 @@
+# GABRYSCOLA - IA Monte Carlo a determinizzazione
+# Per ogni campione si distribuiscono le carte incognite (mano avversaria e mazzo) in modo coerente con quanto
+# già uscito, si gioca ogni carta candidata e si completa la partita con l'euristica maestro; a mazzo finito
+# il resto della smazzata è calcolato esatto da finale.py. Vince la carta col miglior guadagno medio.
+# I campioni si dividono in fette brevi su un pool di processi, così la scelta si chiude entro il tempo dato.
+
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from motore import NESSUNA, TUTTE, BIT, StatoPartita, carte, maschera
+import ia
+import finale
+
+BUDGET_SECONDI = 0.6
+LATENZA_MASSIMA = 2.0 # Oltre questo tempo l'IA risponde comunque: il prompt dello screen reader non resta muto
+FETTA_SECONDI = 0.05 # Durata di un lavoro sul pool: entro una fetta ci si ferma a budget scaduto
+
+_risolutore = finale.RisolutoreFinale()
+
+def smazzata_casuale(rng, mano, carta_tavolo, carta_briscola, uscite, carte_nel_mazzo):
+    """Una distribuzione delle carte incognite coerente con quanto visto: (mano avversaria, mazzo dall'alto)."""
+    tavolo = 0 if carta_tavolo == NESSUNA else BIT[carta_tavolo]
+    fondo = BIT[carta_briscola] if carte_nel_mazzo > 0 else 0
+    incognite = carte(TUTTE & ~uscite & ~maschera(mano) & ~tavolo & ~fondo); rng.shuffle(incognite)
+    carte_avv = len(mano) - (1 if tavolo else 0)
+    mazzo = incognite[carte_avv:] + ([carta_briscola] if fondo else [])
+    return maschera(incognite[:carte_avv]), mazzo
+
+def guadagno_dopo(stato, carta):
+    """Punti futuri del giocatore 0 se gioca carta e poi si prosegue con maestro, esatto a mazzo finito."""
+    partenza = stato.punti[0]; stato.giocata(carta); giocate = 1
+    while not stato.finita and stato.carte_nel_mazzo() > 0:
+        stato.giocata(ia.politica_maestro(stato, stato.turno)); giocate += 1
+    valore = stato.punti[0] - partenza
+    if not stato.finita: valore += _risolutore.valore_esatto(stato.mani[0], stato.mani[1], stato.tavolo, stato.turno, stato.briscola)
+    for _ in range(giocate): stato.annulla()
+    return valore
+
+def campiona(posizione, secondi, iterazioni, seme):
+    """Lavoro di una fetta: (totali per carta, campioni). Ogni campione prova tutte le carte sulla stessa smazzata."""
+    mano, carta_tavolo, carta_briscola, uscite, carte_nel_mazzo = posizione
+    rng = random.Random(seme); totali = [0] * len(mano); campioni = 0
+    scadenza = time.perf_counter() + secondi
+    while campioni < iterazioni and (campioni == 0 or time.perf_counter() < scadenza):
+        mano_avv, mazzo = smazzata_casuale(rng, mano, carta_tavolo, carta_briscola, uscite, carte_nel_mazzo)
+        stato = StatoPartita.da_posizione((maschera(mano), mano_avv), mazzo, carta_briscola, uscite, carta_tavolo, 0)
+        for i, c in enumerate(mano): totali[i] += guadagno_dopo(stato, c)
+        campioni += 1
+    return totali, campioni
+
+class MonteCarlo:
+    """Secondo livello di IA. budget_secondi e/o iterazioni limitano ogni scelta; processi > 1 usa un pool di processi,
+    thread=True un pool di thread (utile per non bloccare chi chiama, non per la velocità)."""
+
+    def __init__(self, budget_secondi=BUDGET_SECONDI, iterazioni=None, processi=None, thread=False, seme=None):
+        self.budget_secondi = min(budget_secondi, LATENZA_MASSIMA); self.iterazioni = iterazioni
+        self.processi = processi or os.cpu_count() or 1; self.thread = thread
+        self.rng = random.Random(seme); self._pool = None
+        self.ultimi_campioni = 0
+
+    def _esecutore(self):
+        if self._pool is None:
+            # I processi partono da zero (spawn): la prima scelta può arrivare dal thread della riflessione, e un fork
+            # con altri thread attivi può lasciare i figli bloccati su un lock copiato a metà
+            if self.thread: self._pool = ThreadPoolExecutor(self.processi)
+            else: self._pool = ProcessPoolExecutor(self.processi, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def avvia(self):
+        """Crea il pool e ne avvia i processi subito, dal thread che chiama, invece che alla prima scelta."""
+        if self.processi > 1 or self.thread: list(self._esecutore().map(abs, range(4 * self.processi)))
+        return self
+
+    def chiudi(self):
+        if self._pool is not None: self._pool.shutdown(cancel_futures=True); self._pool = None
+
+    def valuta(self, mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo, stop=None, budget_secondi=None):
+        """Guadagno medio di ogni carta della mano. stop (threading.Event) interrompe la ricerca in anticipo,
+        budget_secondi sostituisce per questa volta quello dell'istanza."""
+        posizione = (tuple(mano), carta_tavolo, carta_briscola, uscite, carte_nel_mazzo)
+        scadenza = time.perf_counter() + min(budget_secondi or self.budget_secondi, LATENZA_MASSIMA)
+        rimaste = self.iterazioni if self.iterazioni is not None else float("inf")
+        totali = [0] * len(mano); campioni = 0
+        def fetta(): return min(FETTA_SECONDI, max(0.0, scadenza - time.perf_counter()))
+        if self.processi <= 1 and not self.thread:
+            while rimaste > 0 and time.perf_counter() < scadenza and not (stop and stop.is_set()):
+                parziali, n = campiona(posizione, fetta(), min(rimaste, 1 << 30), self.rng.getrandbits(32))
+                totali = [a + b for a, b in zip(totali, parziali)]; campioni += n; rimaste -= n
+        else:
+            pool = self._esecutore(); in_corso = set()
+            while True:
+                fermo = time.perf_counter() >= scadenza or rimaste <= 0 or (stop and stop.is_set())
+                while not fermo and len(in_corso) < self.processi:
+                    quote = max(1, min(rimaste, 1 << 30) // self.processi) if rimaste != float("inf") else 1 << 30
+                    in_corso.add(pool.submit(campiona, posizione, fetta(), quote, self.rng.getrandbits(32)))
+                    rimaste -= quote if rimaste != float("inf") else 0
+                if not in_corso: break
+                finiti, in_corso = wait(in_corso, timeout=FETTA_SECONDI * 2, return_when=FIRST_COMPLETED)
+                for futuro in finiti:
+                    parziali, n = futuro.result()
+                    totali = [a + b for a, b in zip(totali, parziali)]; campioni += n
+                if fermo and time.perf_counter() >= scadenza + FETTA_SECONDI * 2:
+                    for futuro in in_corso: futuro.cancel()
+                    break
+        self.ultimi_campioni = campioni
+        return [t / campioni for t in totali] if campioni else [0.0] * len(mano)
+
+    def scegli(self, mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo, stop=None, budget_secondi=None):
+        """Carta da giocare; nelle ultime pescate e a mazzo finito decide il risolutore esatto."""
+        return self.scegli_valutata(mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo, stop, budget_secondi)[0]
+
+    def scegli_valutata(self, mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo, stop=None, budget_secondi=None):
+        """Come scegli, ma restituisce (carta, guadagno medio); il valore è None se la carta era obbligata o l'ha scelta il risolutore."""
+        if len(mano) == 1: return mano[0], None
+        scelta = _risolutore.scegli(mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo)
+        if scelta != NESSUNA: return scelta, None
+        valori = self.valuta(mano, carta_tavolo, seme_briscola, carta_briscola, uscite, carte_nel_mazzo, stop, budget_secondi)
+        i = max(range(len(mano)), key=lambda i: (valori[i], -i))
+        return mano[i], valori[i]
+
+# --- Politica per StatoPartita (autogioco), a iterazioni fisse per restare riproducibile ---
+_montecarlo = MonteCarlo(budget_secondi=LATENZA_MASSIMA, iterazioni=60, processi=1, seme=0)
+
+def politica_montecarlo(stato, giocatore):
+    _montecarlo.rng.seed(hash((stato.mani[giocatore], stato.uscite, stato.tavolo))) # Stessa posizione, stessa scelta
+    return _montecarlo.scegli(carte(stato.mani[giocatore]), stato.tavolo, stato.briscola, stato.carta_briscola, stato.uscite, stato.carte_nel_mazzo())
@@ -0,0 +1,113 @@
+# GABRYSCOLA - Motore di gioco compatto
+# Le carte sono interi 0-39: indice = (seme_id - 1) * 10 + (valore - 1), nello stesso ordine di Mazzo.
+# Mani e carte uscite sono maschere a 40 bit; il mazzo è un array di indici con un cursore.
+# Le Carta di gabryscola restano la vista di presentazione per lo screen reader.
+
+from array import array
+
+NUM_CARTE = 40
+PUNTI_BRISCOLA = {1: 11, 3: 10, 10: 4, 9: 3, 8: 2}
+TUTTE = (1 << NUM_CARTE) - 1
+NESSUNA = -1 # Tavolo vuoto
+
+def seme(c): return c // 10
+def valore(c): return c % 10 + 1
+
+PUNTI = tuple(PUNTI_BRISCOLA.get(valore(c), 0) for c in range(NUM_CARTE))
+FORZA = tuple(PUNTI[c] * 10 + valore(c) for c in range(NUM_CARTE)) # Come Briscola._get_valore_comparativo
+BIT = tuple(1 << c for c in range(NUM_CARTE))
+MASCHERA_SEME = tuple(((1 << 10) - 1) << (10 * s) for s in range(4))
+
+def _tabella_vincitore(seme_briscola):
+    """VINCE_PRIMA[b][c1 * 40 + c2] è True se c1, giocata per prima, prende c2 con briscola di seme b."""
+    tabella = []
+    for c1 in range(NUM_CARTE):
+        for c2 in range(NUM_CARTE):
+            b1 = seme(c1) == seme_briscola; b2 = seme(c2) == seme_briscola
+            if b1 != b2: tabella.append(b1)
+            elif b1 or seme(c1) == seme(c2): tabella.append(FORZA[c1] > FORZA[c2])
+            else: tabella.append(True)
+    return tuple(tabella)
+
+VINCE_PRIMA = tuple(_tabella_vincitore(s) for s in range(4))
+PUNTI_PRESA = tuple(PUNTI[c1] + PUNTI[c2] for c1 in range(NUM_CARTE) for c2 in range(NUM_CARTE))
+
+def carte(maschera):
+    """Elenca le carte di una maschera in ordine crescente."""
+    risultato = []
+    while maschera:
+        basso = maschera & -maschera
+        risultato.append(basso.bit_length() - 1); maschera ^= basso
+    return risultato
+
+def maschera(sequenza):
+    m = 0
+    for c in sequenza: m |= BIT[c]
+    return m
+
+class StatoPartita:
+    """Stato completo di una partita a due (giocatori 0 e 1) con giocata/annulla senza copie.
+    ordine è il mazzo mescolato dall'alto: 3 carte al giocatore 0, 3 al giocatore 1, la settima è la briscola
+    e finisce in fondo al mazzo, come in Briscola._prepara_partita."""
+    __slots__ = ("carta_briscola", "briscola", "vince", "mazzo", "cursore", "mani", "prese", "punti", "uscite",
+                 "tavolo", "turno", "di_mano", "_storia")
+
+    def __init__(self, ordine, di_mano=0):
+        self.carta_briscola = ordine[6]; self.briscola = seme(ordine[6]); self.vince = VINCE_PRIMA[self.briscola]
+        self.mazzo = array('b', list(ordine[7:]) + [ordine[6]]); self.cursore = 0
+        self.mani = [maschera(ordine[0:3]), maschera(ordine[3:6])]
+        self.prese = [0, 0]; self.punti = [0, 0]; self.uscite = 0
+        self.tavolo = NESSUNA; self.turno = di_mano; self.di_mano = di_mano
+        self._storia = []
+
+    @classmethod
+    def da_posizione(cls, mani, mazzo, carta_briscola, uscite=0, tavolo=NESSUNA, turno=0, punti=(0, 0)):
+        """Stato a partita iniziata, ad esempio una smazzata ipotetica delle carte incognite.
+        mazzo sono le carte ancora da pescare dall'alto, briscola scoperta compresa; le prese non sono note e restano vuote."""
+        stato = cls.__new__(cls)
+        stato.carta_briscola = carta_briscola; stato.briscola = seme(carta_briscola); stato.vince = VINCE_PRIMA[stato.briscola]
+        stato.mazzo = array('b', mazzo); stato.cursore = 0
+        stato.mani = list(mani); stato.prese = [0, 0]; stato.punti = list(punti); stato.uscite = uscite
+        stato.tavolo = tavolo; stato.turno = turno; stato.di_mano = turno if tavolo == NESSUNA else 1 - turno
+        stato._storia = []
+        return stato
+
+    def carte_nel_mazzo(self): return len(self.mazzo) - self.cursore
+
+    @property
+    def finita(self): return not (self.mani[0] or self.mani[1]) and self.tavolo == NESSUNA
+
+    def mosse(self): return carte(self.mani[self.turno])
+
+    def giocata(self, c):
+        """Gioca la carta c per il giocatore di turno. Chiusa la presa, assegna i punti e fa pescare prima il vincitore."""
+        g = self.turno; self.mani[g] ^= BIT[c]
+        if self.tavolo == NESSUNA:
+            self.tavolo = c; self.turno = 1 - g
+            self._storia.append(None)
+            return
+        primo = self.di_mano; c1 = self.tavolo
+        vincitore = primo if self.vince[c1 * NUM_CARTE + c] else g
+        punti = PUNTI_PRESA[c1 * NUM_CARTE + c]
+        self.prese[vincitore] |= BIT[c1] | BIT[c]; self.punti[vincitore] += punti; self.uscite |= BIT[c1] | BIT[c]
+        pescata = self.cursore < len(self.mazzo)
+        if pescata:
+            self.mani[vincitore] |= BIT[self.mazzo[self.cursore]]; self.mani[1 - vincitore] |= BIT[self.mazzo[self.cursore + 1]]
+            self.cursore += 2
+        self._storia.append((c1, c, primo, vincitore, punti, pescata))
+        self.tavolo = NESSUNA; self.turno = self.di_mano = vincitore
+
+    def annulla(self):
+        """Disfa l'ultima giocata."""
+        voce = self._storia.pop()
+        if voce is None:
+            c = self.tavolo; self.tavolo = NESSUNA; self.turno = 1 - self.turno
+            self.mani[self.turno] |= BIT[c]
+            return
+        c1, c2, primo, vincitore, punti, pescata = voce
+        if pescata:
+            self.cursore -= 2
+            self.mani[vincitore] ^= BIT[self.mazzo[self.cursore]]; self.mani[1 - vincitore] ^= BIT[self.mazzo[self.cursore + 1]]
+        self.prese[vincitore] ^= BIT[c1] | BIT[c2]; self.punti[vincitore] -= punti; self.uscite ^= BIT[c1] | BIT[c2]
+        self.mani[1 - primo] |= BIT[c2]
+        self.tavolo = c1; self.di_mano = primo; self.turno = 1 - primo
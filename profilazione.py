@@ -0,0 +1,122 @@
+# GABRYSCOLA - Profilazione leggera dei punti caldi
+# Con la modalità profile si avvolgono con contatori e tempi: la scelta dell'IA maestro (in risposta e in apertura),
+# _determina_vincitore_mano, le operazioni sul mazzo, l'archivio della classifica e l'attesa fra la mossa del
+# giocatore e la carta dell'IA. A modalità spenta non si installa nulla: il gioco gira con le funzioni originali.
+# A richiesta gira anche cProfile (file .prof per pstats o snakeviz) e un campionatore delle pile di tutti i thread,
+# salvate nel formato compresso "a;b;c N" che leggono flamegraph.pl e speedscope.
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import classifica_db
+from motore import NESSUNA
+
+INTERVALLO_CAMPIONI = 0.005 # Secondi fra due campioni delle pile
+_IN_ATTESA = {"_leggi_scelta_giocatore", "wait", "_wait_for_tstate_lock"} # Pile ferme ad aspettare: non sono lavoro
+
+class Statistica:
+    __slots__ = ("chiamate", "totale", "massimo")
+    def __init__(self): self.chiamate = 0; self.totale = 0.0; self.massimo = 0.0
+
+class Profilatore:
+    """Si installa sulle classi del gioco con installa() e si toglie con disinstalla(). Le misure sono in secondi."""
+
+    def __init__(self):
+        self.voci = {}; self._originali = []; self._fine_mossa = None
+        self._cprofile = None; self._campionatore = None; self._ferma_campioni = threading.Event(); self.pile = Counter()
+
+    def misura(self, nome, durata):
+        voce = self.voci.get(nome)
+        if voce is None: voce = self.voci[nome] = Statistica()
+        voce.chiamate += 1; voce.totale += durata
+        if durata > voce.massimo: voce.massimo = durata
+
+    def _sostituisci(self, proprietario, attributo, nuova):
+        self._originali.append((proprietario, attributo, proprietario.__dict__[attributo])); setattr(proprietario, attributo, nuova)
+
+    def _avvolgi(self, proprietario, attributo, nome):
+        originale = proprietario.__dict__[attributo]; misura = self.misura
+        def avvolta(*args, **kwargs):
+            inizio = time.perf_counter()
+            try: return originale(*args, **kwargs)
+            finally: misura(nome, time.perf_counter() - inizio)
+        self._sostituisci(proprietario, attributo, avvolta)
+
+    def installa(self, briscola, mazzo):
+        """Avvolge i metodi delle classi Briscola e Mazzo del gioco e quelli di classifica_db.ClassificaDB."""
+        misura = self.misura; profilatore = self
+        carta_maestro = briscola.__dict__["_carta_maestro"]
+        def _carta_maestro(gioco, posizione):
+            inizio = time.perf_counter()
+            try: return carta_maestro(gioco, posizione)
+            finally: misura("IA maestro in apertura" if posizione[1] == NESSUNA else "IA maestro in risposta, anche durante la riflessione", time.perf_counter() - inizio)
+        self._sostituisci(briscola, "_carta_maestro", _carta_maestro)
+        prompt = briscola.__dict__["_stampa_prompt_giocatore"]
+        def _stampa_prompt_giocatore(gioco):
+            try: return prompt(gioco)
+            finally: profilatore._fine_mossa = time.perf_counter()
+        self._sostituisci(briscola, "_stampa_prompt_giocatore", _stampa_prompt_giocatore)
+        scelta = briscola.__dict__["_scelta_computer"]
+        def _scelta_computer(gioco):
+            inizio = time.perf_counter()
+            try: return scelta(gioco)
+            finally:
+                fine = time.perf_counter(); misura("Scelta completa dell'IA, con cache e riflessione", fine - inizio)
+                if profilatore._fine_mossa is not None:
+                    misura("Attesa fra la tua mossa e la carta dell'IA", fine - profilatore._fine_mossa); profilatore._fine_mossa = None
+        self._sostituisci(briscola, "_scelta_computer", _scelta_computer)
+        self._avvolgi(briscola, "_determina_vincitore_mano", "Vincitore della mano")
+        for attributo, nome in (("__init__", "Nuovo mazzo"), ("mescola_mazzo", "Mescolata"), ("pesca", "Pescata")): self._avvolgi(mazzo, attributo, nome)
+        for attributo, nome in (("__init__", "Apertura della classifica"), ("importa_json", "Importazione della classifica JSON"),
+                                ("registra", "Scrittura in classifica"), ("migliori", "Lettura della classifica")):
+            self._avvolgi(classifica_db.ClassificaDB, attributo, nome)
+        return self
+
+    def disinstalla(self):
+        while self._originali:
+            proprietario, attributo, originale = self._originali.pop(); setattr(proprietario, attributo, originale)
+
+    # --- cProfile e pile per i flamegraph ---
+    def avvia_profilo(self, cprofile=True, pile=True):
+        if cprofile: self._cprofile = cProfile.Profile(); self._cprofile.enable()
+        if pile:
+            self._campionatore = threading.Thread(target=self._campiona, name="campionatore", daemon=True); self._campionatore.start()
+
+    def ferma_profilo(self):
+        if self._cprofile: self._cprofile.disable()
+        if self._campionatore: self._ferma_campioni.set(); self._campionatore.join(); self._campionatore = None
+
+    def _campiona(self):
+        proprio = threading.get_ident()
+        while not self._ferma_campioni.wait(INTERVALLO_CAMPIONI):
+            nomi = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == proprio or frame.f_code.co_name in _IN_ATTESA: continue
+                pila = []
+                while frame: pila.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"); frame = frame.f_back
+                pila.append(nomi.get(ident, "thread")); self.pile[";".join(reversed(pila))] += 1
+
+    def salva(self, nome_base):
+        """Scrive nome_base.prof (cProfile) e nome_base.pile.txt (pile compresse); restituisce i file scritti."""
+        scritti = []
+        if self._cprofile: self._cprofile.dump_stats(nome_base + ".prof"); scritti.append(nome_base + ".prof")
+        if self.pile:
+            with open(nome_base + ".pile.txt", 'w', encoding='utf-8') as f:
+                for pila, n in self.pile.most_common(): f.write(f"{pila} {n}\n")
+            scritti.append(nome_base + ".pile.txt")
+        return scritti
+
+    def riepilogo(self, cache=None):
+        """Una frase per misura, senza tabelle: si legge bene anche con la sintesi vocale.
+        Con cache (cache_decisioni.CacheDecisioni) aggiunge i suoi contatori, per dimensionarla."""
+        coda = [f"Cache delle decisioni: {cache.descrizione()}"] if cache is not None else []
+        if not self.voci: return ["Profilo: nessuna misura raccolta."] + coda
+        righe = ["Profilo del match, tempi in millisecondi:"]
+        for nome, v in sorted(self.voci.items(), key=lambda voce: -voce[1].totale):
+            righe.append(f"{nome}: {v.chiamate} {'chiamata' if v.chiamate == 1 else 'chiamate'}, media {v.totale / v.chiamate * 1000:.3f}, "
+                         f"massimo {v.massimo * 1000:.3f}, totale {v.totale * 1000:.1f}.")
+        return righe + coda
@@ -0,0 +1,98 @@
+# GABRYSCOLA - Registro binario delle partite
+# Un record di dimensione fissa per partita: seme, ordine del mazzo mescolato e le 40 giocate come indici di carta
+# del motore. Accanto al file dati c'è un indice di offset a 64 bit per saltare alla partita N in O(1).
+# Lo scrittore scarica su disco ogni pochi record, senza tenere le partite in memoria.
+#
+# File dati:  intestazione "GBRS" + versione (uint16) + dimensione record (uint16), poi i record.
+# Record:     seme (uint64), flag (uint8: bit 0 = giocatore 1 di mano, bit 1 = abbandonata), giocate (uint8),
+#             punti giocatore 0 e 1 (uint8), ordine del mazzo (40 byte), giocate (40 byte, 0xFF dove mancano).
+# File indice: un uint64 per record con l'offset nel file dati.
+
+import os
+import struct
+from collections import namedtuple
+
+from motore import NUM_CARTE, StatoPartita
+
+MAGIA = b"GBRS"
+VERSIONE = 1
+_INTESTAZIONE = struct.Struct("<4sHH")
+_RECORD = struct.Struct(f"<QBBBB{NUM_CARTE}s{NUM_CARTE}s")
+_OFFSET = struct.Struct("<Q")
+NESSUNA_GIOCATA = 0xFF
+FLAG_SECONDO_DI_MANO = 1
+FLAG_ABBANDONATA = 2
+SCARICA_OGNI = 64
+
+Partita = namedtuple("Partita", ["seme", "ordine", "giocate", "di_mano", "punti", "abbandonata"])
+
+def percorso_indice(percorso): return percorso + ".idx"
+
+class ScrittoreRegistro:
+    """Aggiunge partite in coda a un registro (lo crea se non esiste). Usabile come context manager."""
+
+    def __init__(self, percorso, scarica_ogni=SCARICA_OGNI):
+        nuovo = not os.path.exists(percorso) or os.path.getsize(percorso) == 0
+        self._dati = open(percorso, "ab"); self._indice = open(percorso_indice(percorso), "ab")
+        if nuovo: self._dati.write(_INTESTAZIONE.pack(MAGIA, VERSIONE, _RECORD.size))
+        self._offset = self._dati.tell(); self._scarica_ogni = scarica_ogni; self._da_scaricare = 0
+        self.scritte = 0
+
+    def __enter__(self): return self
+    def __exit__(self, *eccezione): self.chiudi()
+
+    def scrivi(self, seme, ordine, giocate, di_mano, punti, abbandonata=False):
+        """ordine: le 40 carte del mazzo mescolato dall'alto; giocate: le carte nell'ordine in cui sono state giocate."""
+        flag = (FLAG_SECONDO_DI_MANO if di_mano == 1 else 0) | (FLAG_ABBANDONATA if abbandonata else 0)
+        giocate = bytes(giocate)
+        record = _RECORD.pack(seme or 0, flag, len(giocate), punti[0], punti[1], bytes(ordine),
+                              giocate + bytes([NESSUNA_GIOCATA]) * (NUM_CARTE - len(giocate)))
+        self._dati.write(record); self._indice.write(_OFFSET.pack(self._offset))
+        self._offset += _RECORD.size; self.scritte += 1; self._da_scaricare += 1
+        if self._da_scaricare >= self._scarica_ogni: self.scarica()
+
+    def scarica(self):
+        self._dati.flush(); self._indice.flush(); self._da_scaricare = 0
+
+    def chiudi(self):
+        if not self._dati.closed: self.scarica(); self._dati.close(); self._indice.close()
+
+class LettoreRegistro:
+    """Accesso casuale (registro[n]) e in streaming (for partita in registro) alle partite di un registro."""
+
+    def __init__(self, percorso):
+        self._dati = open(percorso, "rb"); self._indice = open(percorso_indice(percorso), "rb")
+        magia, versione, dimensione = _INTESTAZIONE.unpack(self._dati.read(_INTESTAZIONE.size))
+        if magia != MAGIA or versione != VERSIONE or dimensione != _RECORD.size:
+            raise ValueError(f"{percorso} non è un registro Gabryscola versione {VERSIONE}.")
+
+    def __enter__(self): return self
+    def __exit__(self, *eccezione): self.chiudi()
+    def chiudi(self): self._dati.close(); self._indice.close()
+
+    def __len__(self): return os.fstat(self._indice.fileno()).st_size // _OFFSET.size
+
+    def __getitem__(self, n):
+        if n < 0: n += len(self)
+        if not 0 <= n < len(self): raise IndexError(n)
+        self._indice.seek(n * _OFFSET.size); offset, = _OFFSET.unpack(self._indice.read(_OFFSET.size))
+        self._dati.seek(offset)
+        return _decodifica(self._dati.read(_RECORD.size))
+
+    def __iter__(self):
+        self._dati.seek(_INTESTAZIONE.size)
+        while True:
+            record = self._dati.read(_RECORD.size)
+            if len(record) < _RECORD.size: return # Un record troncato a metà (scrittura interrotta) si ignora
+            yield _decodifica(record)
+
+def _decodifica(record):
+    seme, flag, n, punti_0, punti_1, ordine, giocate = _RECORD.unpack(record)
+    return Partita(seme, list(ordine), list(giocate[:n]), 1 if flag & FLAG_SECONDO_DI_MANO else 0,
+                   (punti_0, punti_1), bool(flag & FLAG_ABBANDONATA))
+
+def ricostruisci(partita, giocate=None):
+    """StatoPartita dopo le prime `giocate` carte della partita (tutte se None)."""
+    stato = StatoPartita(partita.ordine, partita.di_mano)
+    for c in partita.giocate[:giocate]: stato.giocata(c)
+    return stato
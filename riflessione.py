@@ -0,0 +1,36 @@
+# GABRYSCOLA - Riflessione dell'IA durante il turno del giocatore
+# Mentre il prompt aspetta l'input, un thread calcola in anticipo le scelte dell'IA per le posizioni che
+# potrebbero presentarsi (ad esempio ogni carta che il giocatore potrebbe aprire) e le tiene da parte.
+
+import threading
+
+class Riflessione:
+    """calcola(posizione, stop, rapida) restituisce la carta dell'IA per una posizione e deve fermarsi presto se stop è impostato.
+    Con passata_rapida si fa prima un giro veloce su tutte le posizioni, poi uno completo che ne migliora le risposte.
+    successive(risposte), se data, propone altre posizioni da preparare una volta finite le prime."""
+
+    def __init__(self, calcola, posizioni, successive=None, passata_rapida=False):
+        self._calcola = calcola; self._posizioni = list(posizioni); self._successive = successive
+        self._passate = (True, False) if passata_rapida else (False,)
+        self._stop = threading.Event(); self._thread = threading.Thread(target=self._lavora, name="riflessione", daemon=True)
+        self.risposte = {}
+
+    def avvia(self): self._thread.start(); return self
+
+    def _lavora(self):
+        for rapida in self._passate:
+            if not self._prepara(self._posizioni, rapida): return
+        if self._successive: self._prepara(list(self._successive(dict(self.risposte))), False)
+
+    def _prepara(self, posizioni, rapida):
+        for posizione in posizioni:
+            if self._stop.is_set(): return False
+            carta = self._calcola(posizione, self._stop, rapida)
+            # Un calcolo interrotto è parziale: meglio tenere la risposta precedente, se c'è
+            if not self._stop.is_set(): self.risposte[posizione] = carta
+        return True
+
+    def ferma(self):
+        """Interrompe il lavoro, aspetta il thread e restituisce le risposte pronte."""
+        self._stop.set(); self._thread.join()
+        return self.risposte
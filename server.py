@@ -0,0 +1,258 @@
+# GABRYSCOLA - Server di gioco multi-tavolo
+# Molti match contemporanei in un solo processo asyncio, su un protocollo TCP a righe di testo adatto a un terminale
+# o a un display braille: ogni messaggio è una riga, le righe che aspettano una risposta finiscono con ">" o ":".
+# Il turno del giocatore usa lo stesso prompt compatto del gioco (R.. B.. T.. P.. - C ...); si risponde col numero
+# della carta o con "abbandona". Le decisioni dell'IA vanno a un pool di processi, così un tavolo non ferma gli
+# altri; una cache condivisa evita di ricalcolare le posizioni già viste. Ogni tavolo ha un tempo massimo per
+# mossa, e i risultati finiscono nella classifica SQLite da un thread dedicato, senza bloccare il ciclo di eventi.
+# Uso: python server.py [--host 127.0.0.1] [--porta 4747] [--processi P] [--timeout 600]
+#      python server.py --simula 50 [--inattivi 1000] [--partite 1]   (clienti simulati in locale)
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+try:
+    import resource # Solo Unix: serve alla misura della memoria nella simulazione, non al server
+except ImportError:
+    resource = None
+
+import motore, ia, finale, cache_decisioni, classifica_db
+import gabryscola
+
+HOST = "127.0.0.1"
+PORTA = 4747
+TIMEOUT_MOSSA = 600.0 # Secondi di attesa di una risposta prima di chiudere il tavolo
+MAX_NOME = 20
+
+# --- Processi di lavoro ---
+_risolutore = finale.RisolutoreFinale() # Uno per processo, con la sua tabella di trasposizione
+
+def _scelta_ia(posizione, carta_briscola, pesi):
+    """(carta, valore, carte pari): la cache del server ricorda anche le pari, per rompere la parità come l'euristica."""
+    return gabryscola.carta_maestro(posizione, carta_briscola, _risolutore, pesi)
+
+def _registra_classifica(percorso, nome, wins, ties, losses, punti_totali):
+    with classifica_db.ClassificaDB(percorso) as db:
+        db.importa_json(gabryscola.CLASSIFICA_FILE); db.registra(nome, wins, ties, losses, punti_totali)
+
+class TempoScaduto(Exception): pass
+
+class Server:
+    """Stato condiviso fra i tavoli: esecutore per l'IA, cache delle decisioni per livello, scrittura della classifica."""
+
+    def __init__(self, esecutore, classifica=gabryscola.CLASSIFICA_DB, timeout=TIMEOUT_MOSSA, libro=cache_decisioni.LIBRO_FILE):
+        self.esecutore = esecutore; self.classifica = classifica; self.timeout = timeout
+        self._scrittore_classifica = ThreadPoolExecutor(1, thread_name_prefix="classifica") # SQLite vuole un solo scrittore
+        self.profili = ia.carica_profili()
+        self.cache = {"maestro": cache_decisioni.CacheDecisioni()}; self.cache["maestro"].carica(libro, "maestro")
+        self.tavoli_aperti = 0; self.match_finiti = 0
+
+    def livelli(self):
+        """[(nome, pesi)]: il maestro e i profili salvati da taratura.py."""
+        return [("maestro", ia.PESI_MAESTRO)] + [(f"profilo:{nome}", pesi) for nome, pesi in self.profili.items()]
+
+    async def avvia(self, host=HOST, porta=PORTA):
+        return await asyncio.start_server(self._nuovo_tavolo, host, porta)
+
+    async def _nuovo_tavolo(self, lettore, scrittore):
+        self.tavoli_aperti += 1
+        try: await Tavolo(self, lettore, scrittore).gioca()
+        except (TempoScaduto, ConnectionError, asyncio.IncompleteReadError): pass
+        finally:
+            self.tavoli_aperti -= 1; scrittore.close()
+            try: await scrittore.wait_closed()
+            except ConnectionError: pass
+
+    async def scelta_ia(self, gioco, livello, pesi):
+        """Toglie dalla mano dell'IA la carta scelta: dalla cache se la posizione è nota, altrimenti dall'esecutore."""
+        posizione = gioco._posizione_ia(); mano_pc, carta_tavolo, seme_briscola, uscite, carte_nel_mazzo = posizione
+        argomenti = (mano_pc, carta_tavolo, seme_briscola, gioco.briscola.indice, uscite, carte_nel_mazzo)
+        # Nel finale decide il risolutore esatto: una voce di libro non deve scavalcarlo
+        cache = None if _risolutore.applicabile(carte_nel_mazzo) else self.cache.setdefault(livello, cache_decisioni.CacheDecisioni())
+        trovata = cache.cerca(*argomenti) if cache is not None else None
+        if trovata: carta = trovata[0]
+        else:
+            carta, valore, pari = await asyncio.get_running_loop().run_in_executor(self.esecutore, _scelta_ia, posizione, gioco.briscola.indice, pesi)
+            if cache is not None: cache.memorizza(*argomenti, carta, valore, pari)
+        return gioco.giocatore_pc.mano.pop(mano_pc.index(carta))
+
+    async def registra(self, nome, wins, ties, losses, punti_totali):
+        await asyncio.get_running_loop().run_in_executor(self._scrittore_classifica, _registra_classifica,
+                                                         self.classifica, nome, wins, ties, losses, punti_totali)
+
+    def chiudi(self): self._scrittore_classifica.shutdown()
+
+class Tavolo:
+    """Un match al meglio di N partite contro l'IA, con le regole di Briscola.avvia_match."""
+
+    def __init__(self, server, lettore, scrittore):
+        self.server = server; self.lettore = lettore; self.scrittore = scrittore; self.gioco = None
+
+    async def scrivi(self, testo):
+        self.scrittore.write((testo + "\n").encode("utf-8")); await self.scrittore.drain()
+
+    async def chiedi(self, domanda):
+        await self.scrivi(domanda)
+        try: riga = await asyncio.wait_for(self.lettore.readline(), self.server.timeout)
+        except asyncio.TimeoutError: raise TempoScaduto
+        if not riga: raise ConnectionError("Cliente disconnesso")
+        return riga.decode("utf-8", "replace").strip()
+
+    async def chiedi_numero(self, domanda, minimo, massimo, predefinito=None):
+        while True:
+            risposta = await self.chiedi(domanda)
+            if not risposta and predefinito is not None: return predefinito
+            if risposta.isdigit() and minimo <= int(risposta) <= massimo: return int(risposta)
+            await self.scrivi(f"Per favore, inserisci un numero da {minimo} a {massimo}.")
+
+    async def gioca(self):
+        await self.scrivi(f"Gabryscola v{gabryscola.Briscola.VERSIONE}")
+        nome = ""
+        while not nome:
+            nome = (await self.chiedi("Inserisci il tuo nome per la sfida:"))[:MAX_NOME].title()
+        numero_partite = await self.chiedi_numero("Match al meglio di quante partite? (1-11):", 1, 11)
+        livelli = self.server.livelli(); elenco = ", ".join(f"{i} = {n}" for i, (n, _) in enumerate(livelli, 1))
+        self.livello, self.pesi = livelli[await self.chiedi_numero(f"Scegli l'avversario: {elenco}:", 1, len(livelli), 1) - 1]
+        # Lo stato di gioco è quello di Briscola; le decisioni dell'IA le prende il server
+        gioco = self.gioco = gabryscola.Briscola(nome)
+        gioco.risolutore_finale = None; gioco.cache_decisioni = None; gioco.riflessione_attiva = False
+        await self.match(numero_partite)
+        await self.scrivi("Arrivederci.")
+
+    async def match(self, numero_partite):
+        gioco = self.gioco; umano, pc = gioco.giocatore_umano, gioco.giocatore_pc
+        await self.scrivi(f"Oggi {umano.nome} sfida {pc.nome} in un match al meglio di {numero_partite} partite!")
+        di_mano = random.choice((umano, pc)); await self.scrivi(f"Inizia {'tu' if di_mano is umano else pc.nome}.")
+        risultati = {umano: [0, 0, 0], pc: [0, 0, 0]}; punti_totali = {umano: 0, pc: 0} # [vinte, pari, perse]
+        obiettivo = numero_partite / 2.0 + 0.5
+        for i in range(numero_partite):
+            await self.scrivi(f"PARTITA {i + 1}.")
+            vincitore, punti_u, punti_pc = await self.partita(di_mano)
+            if vincitore == "FORFEIT":
+                await self.scrivi("Match abbandonato."); risultati[pc] = [numero_partite, 0, 0]; break
+            punti_totali[umano] += punti_u; punti_totali[pc] += punti_pc
+            if vincitore:
+                perdente = pc if vincitore is umano else umano
+                risultati[vincitore][0] += 1; risultati[perdente][2] += 1
+            else: risultati[umano][1] += 1; risultati[pc][1] += 1
+            w, t, l = risultati[umano]
+            await self.scrivi(f"Risultato parziale (V-P-S): {umano.nome} {w}-{t}-{l} contro {pc.nome} {l}-{t}-{w}.")
+            punti_match = {g: r[0] + r[1] * 0.5 for g, r in risultati.items()}
+            if max(punti_match.values()) >= obiettivo and abs(punti_match[umano] - punti_match[pc]) > numero_partite - (i + 1):
+                await self.scrivi("Il match termina in anticipo: la rimonta è matematicamente impossibile."); break
+            di_mano = pc if di_mano is umano else umano
+        punti_match = {g: r[0] + r[1] * 0.5 for g, r in risultati.items()}
+        chiave = lambda g: (punti_match[g], punti_totali[g])
+        vincitore_match = umano if chiave(umano) > chiave(pc) else pc if chiave(pc) > chiave(umano) else None
+        self.server.match_finiti += 1
+        if not vincitore_match: await self.scrivi("MATCH TERMINATO in patta assoluta."); return
+        await self.scrivi(f"MATCH TERMINATO: vince {vincitore_match.nome}.")
+        await self.server.registra(vincitore_match.nome, *risultati[vincitore_match], punti_totali[vincitore_match])
+        await self.scrivi("Classifica salvata.")
+
+    async def partita(self, di_mano):
+        """Come Briscola.gioca_partita, con l'input dal cliente e l'IA dal server."""
+        gioco = self.gioco; umano, pc = gioco.giocatore_umano, gioco.giocatore_pc
+        gioco._prepara_partita(); await self.scrivi(f"La carta Briscola è: {gioco.briscola.nome}.")
+        mano_n = 1
+        while len(umano.mazzetto) + len(pc.mazzetto) < 40:
+            await self.scrivi(f"Mano n.{mano_n}."); gioco.tavolo = []
+            giocatori = (umano, pc) if di_mano is umano else (pc, umano)
+            for giocatore in giocatori:
+                if giocatore is umano:
+                    carta = await self.scelta_umano()
+                    if carta is None: return "FORFEIT", 0, 0
+                else: carta = await self.server.scelta_ia(gioco, self.livello, self.pesi)
+                await self.scrivi(f"{giocatore.nome} gioca: {carta.nome}."); gioco.tavolo.append(carta)
+            vincitore = gioco._determina_vincitore_mano(gioco.tavolo[0], giocatori[0], gioco.tavolo[1], giocatori[1])
+            punti = sum(motore.PUNTI[c.indice] for c in gioco.tavolo)
+            vincitore.mazzetto.extend(gioco.tavolo); gioco.carte_uscite.update(gioco.tavolo)
+            await self.scrivi(f"{vincitore.nome} vince la mano e prende {punti} punti.")
+            if len(gioco.mazzo) > 0:
+                perdente = giocatori[1] if vincitore is giocatori[0] else giocatori[0]
+                vincitore.mano.extend(gioco.mazzo.pesca(1)); perdente.mano.extend(gioco.mazzo.pesca(1))
+            di_mano = vincitore; mano_n += 1
+        punti_u, punti_pc = umano.calcola_punteggio(), pc.calcola_punteggio()
+        await self.scrivi(f"PARTITA TERMINATA: {umano.nome} {punti_u}, {pc.nome} {punti_pc}.")
+        return (umano if punti_u > 60 else None if punti_u == 60 else pc), punti_u, punti_pc
+
+    async def scelta_umano(self):
+        """La carta giocata (tolta dalla mano), o None se il giocatore abbandona."""
+        mano = self.gioco.giocatore_umano.mano
+        await self.scrivi("Tu hai: " + ". ".join(c.nome for c in mano) + ".")
+        while True:
+            scelta = await self.chiedi(self.gioco._testo_prompt().rstrip())
+            if scelta.lower() == "abbandona": return None
+            if scelta.isdigit() and 1 <= int(scelta) <= len(mano): return mano.pop(int(scelta) - 1)
+            await self.scrivi(f"Scelta non valida. Inserisci un numero tra 1 e {len(mano)}, o abbandona.")
+
+# --- Clienti simulati, per provare il server in locale ---
+async def cliente_simulato(host, porta, nome, partite, rng):
+    """Gioca un match rispondendo a caso; restituisce la latenza massima fra la propria carta e il prompt successivo."""
+    lettore, scrittore = await asyncio.open_connection(host, porta); latenza = 0.0; inviata = None
+    try:
+        while True:
+            riga = (await lettore.readline()).decode("utf-8")
+            if not riga: return latenza
+            risposta = None
+            if riga.startswith("Inserisci il tuo nome"): risposta = nome
+            elif riga.startswith("Match al meglio"): risposta = str(partite)
+            elif riga.startswith("Scegli l'avversario"): risposta = ""
+            elif " - C " in riga and riga.rstrip().endswith(">"):
+                if inviata: latenza = max(latenza, time.perf_counter() - inviata)
+                risposta = str(rng.randint(1, len(riga.split(" - C ")[1].split()) - 1)); inviata = time.perf_counter()
+            if risposta is not None: scrittore.write((risposta + "\n").encode("utf-8")); await scrittore.drain()
+    finally: scrittore.close()
+
+async def cliente_inattivo(host, porta, fermo):
+    """Apre un tavolo, dà il nome e poi resta fermo finché fermo non è impostato."""
+    lettore, scrittore = await asyncio.open_connection(host, porta)
+    scrittore.write(b"Inattivo\n"); await scrittore.drain(); await fermo.wait(); scrittore.close()
+
+def _memoria_massima(): return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0 # In KiB
+
+async def simula(clienti, inattivi, partite, esecutore, classifica, seme=0):
+    server = Server(esecutore, classifica); rete = await server.avvia(HOST, 0); porta = rete.sockets[0].getsockname()[1]
+    fermo = asyncio.Event(); memoria_prima = _memoria_massima()
+    compiti_inattivi = [asyncio.create_task(cliente_inattivo(HOST, porta, fermo)) for _ in range(inattivi)]
+    while server.tavoli_aperti < inattivi: await asyncio.sleep(0.05)
+    memoria_inattivi = _memoria_massima() - memoria_prima
+    inizio = time.perf_counter()
+    latenze = await asyncio.gather(*(cliente_simulato(HOST, porta, f"Simulato{i}", partite, random.Random(seme + i)) for i in range(clienti)))
+    durata = time.perf_counter() - inizio
+    fermo.set(); await asyncio.gather(*compiti_inattivi)
+    rete.close(); await rete.wait_closed(); server.chiudi()
+    print(f"Match finiti: {server.match_finiti} di {clienti} in {durata:.2f} s, con {inattivi} tavoli inattivi aperti.")
+    print(f"Latenza massima della risposta dell'IA: {max(latenze, default=0) * 1000:.1f} ms.")
+    for livello, cache in server.cache.items(): print(f"Cache delle decisioni ({livello}): {cache.descrizione()}")
+    if inattivi and resource: print(f"Memoria per tavolo inattivo (server e clienti insieme): circa {memoria_inattivi * 1024 / inattivi:.0f} byte.")
+
+async def servi(host, porta, esecutore, timeout):
+    server = Server(esecutore, timeout=timeout); rete = await server.avvia(host, porta)
+    print(f"Server Gabryscola in ascolto su {host}:{porta}.")
+    try:
+        async with rete: await rete.serve_forever()
+    finally: server.chiudi()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server Gabryscola: molti tavoli su un protocollo TCP a righe.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--porta", type=int, default=PORTA)
+    parser.add_argument("--processi", type=int, default=None, help="Processi per le decisioni dell'IA.")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_MOSSA, help="Secondi massimi di attesa di una risposta.")
+    parser.add_argument("--simula", type=int, default=0, metavar="CLIENTI", help="Avvia il server in locale con clienti simulati.")
+    parser.add_argument("--inattivi", type=int, default=0, help="Tavoli inattivi da tenere aperti durante la simulazione.")
+    parser.add_argument("--partite", type=int, default=1, help="Partite per match dei clienti simulati.")
+    parser.add_argument("--classifica", default=gabryscola.CLASSIFICA_DB)
+    args = parser.parse_args()
+    # I processi dell'IA partono da zero (spawn): un fork dal processo col ciclo di eventi attivo può bloccarli
+    with ProcessPoolExecutor(args.processi, mp_context=multiprocessing.get_context("spawn")) as esecutore:
+        list(esecutore.map(abs, range(4 * (args.processi or os.cpu_count() or 1)))) # Avvia i processi prima del primo tavolo
+        try:
+            if args.simula: asyncio.run(simula(args.simula, args.inattivi, args.partite, esecutore, args.classifica))
+            else: asyncio.run(servi(args.host, args.porta, esecutore, args.timeout))
+        except KeyboardInterrupt: print("\nServer fermato.")
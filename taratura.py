@@ -0,0 +1,115 @@
+# GABRYSCOLA - Taratura dei pesi dell'euristica maestro
+# SPSA: a ogni iterazione tutti i pesi si perturbano insieme con segni a caso, le due varianti (più e meno) si
+# sfidano in coppie specchiate sulle stesse smazzate e i pesi si spostano verso quella che ha fatto più punti.
+# Le coppie si distribuiscono su un pool di processi; lo stato si salva a ogni iterazione, così una corsa interrotta
+# riprende da dove era arrivata. Alla fine i pesi trovati sfidano quelli predefiniti e si salvano come profilo,
+# che il gioco offre come livello dell'IA (vedi ia.carica_profili).
+# Uso: python taratura.py spsa [--iterazioni 200] [--coppie 100] [--checkpoint taratura.json] [--da-capo]
+#      [--verifica 1000] [--profilo NOME] [--processi P]
+#      python taratura.py profili
+
+import argparse
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import ia
+from torneo import punteggio_specchiato, elo_da_punteggio
+
+CHECKPOINT_FILE = "taratura.json"
+VERSIONE_CHECKPOINT = 1
+# I pesi si cercano in unità dei predefiniti (1 = peso di PESI_MAESTRO), dentro questi limiti
+SCALA = ia.PESI_MAESTRO
+LIMITI = [(0.0, 4.0)] * 4 + [(0.1, 4.0), (0.0, 4.0)] # scala_opportunita divide: mai zero
+PASSO_A, PASSO_C, ALFA_SPSA, GAMMA_SPSA = 0.3, 0.1, 0.602, 0.101
+SEME_VERIFICA = 10 ** 6 # Smazzate della verifica finale, lontane da quelle della taratura
+
+def pesi_da_theta(theta): return ia.Pesi(*(t * s for t, s in zip(theta, SCALA)))
+
+def _limita(theta): return [min(max(t, basso), alto) for t, (basso, alto) in zip(theta, LIMITI)]
+
+def _gioca_lavoro(args):
+    semi, pesi_a, pesi_b = args
+    politica_a, politica_b = ia.politica_pesi(pesi_a), ia.politica_pesi(pesi_b)
+    return sum(punteggio_specchiato(seme, politica_a, politica_b) for seme in semi)
+
+def confronta_pesi(pesi_a, pesi_b, semi, pool, processi):
+    """Punteggio medio di A (fra 0 e 1) sulle coppie specchiate dei semi dati."""
+    semi = list(semi); passo = -(-len(semi) // processi)
+    lavori = [(semi[i:i + passo], pesi_a, pesi_b) for i in range(0, len(semi), passo)]
+    return sum(pool.map(_gioca_lavoro, lavori)) / (2 * len(semi))
+
+def _stato_iniziale(seme, coppie, a, c, iterazioni):
+    # La stabilità dei passi si fissa sulle iterazioni previste dalla prima corsa: chi riprende con un traguardo
+    # più lontano prosegue con gli stessi passi
+    return {"versione": VERSIONE_CHECKPOINT, "iterazione": 0, "theta": [1.0] * len(SCALA), "seme": seme,
+            "coppie": coppie, "a": a, "c": c, "stabilita": iterazioni / 10, "storia": []}
+
+def carica_checkpoint(percorso):
+    try:
+        with open(percorso, 'r') as f: stato = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return None
+    return stato if stato.get("versione") == VERSIONE_CHECKPOINT else None
+
+def salva_checkpoint(stato, percorso):
+    temporaneo = percorso + ".tmp"
+    with open(temporaneo, 'w') as f: json.dump(stato, f, indent=4)
+    os.replace(temporaneo, percorso)
+
+def spsa(stato, iterazioni, pool, processi, checkpoint=None, stampa=print):
+    """Porta la taratura fino a `iterazioni`, ripartendo da stato["iterazione"]. Restituisce lo stato aggiornato."""
+    theta = stato["theta"]; coppie = stato["coppie"]
+    stabilita = stato.setdefault("stabilita", iterazioni / 10) # Assente nei checkpoint salvati prima che si registrasse
+    for k in range(stato["iterazione"], iterazioni):
+        # Segni e smazzate dipendono solo da (seme, k): una corsa ripresa rifà esattamente gli stessi passi
+        delta = [random.Random(f"{stato['seme']}-{k}-{i}").choice((-1, 1)) for i in range(len(theta))]
+        ck = stato["c"] / (k + 1) ** GAMMA_SPSA; ak = stato["a"] / (k + 1 + stabilita) ** ALFA_SPSA
+        piu = _limita([t + ck * d for t, d in zip(theta, delta)]); meno = _limita([t - ck * d for t, d in zip(theta, delta)])
+        semi = range(stato["seme"] + k * coppie, stato["seme"] + (k + 1) * coppie)
+        punteggio = confronta_pesi(pesi_da_theta(piu), pesi_da_theta(meno), semi, pool, processi)
+        gradiente = (2 * punteggio - 1) / (2 * ck) # Differenza di punteggio fra più e meno, per unità di perturbazione
+        theta = _limita([t + ak * gradiente * d for t, d in zip(theta, delta)])
+        stato.update(iterazione=k + 1, theta=theta); stato["storia"].append({"iterazione": k + 1, "punteggio_piu": punteggio, "theta": theta})
+        if checkpoint: salva_checkpoint(stato, checkpoint)
+        stampa(f"Iterazione {k + 1} di {iterazioni}: più contro meno {punteggio:.1%}. Pesi: {_descrivi(pesi_da_theta(theta))}.")
+    return stato
+
+def _descrivi(pesi): return ", ".join(f"{nome} {valore:.2f}" for nome, valore in pesi._asdict().items())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Taratura dei pesi dell'IA maestro di Gabryscola.")
+    comandi = parser.add_subparsers(dest="comando", required=True)
+    p = comandi.add_parser("spsa", help="Cerca i pesi con SPSA in autogioco.")
+    p.add_argument("--iterazioni", type=int, default=200)
+    p.add_argument("--coppie", type=int, default=100, help="Coppie specchiate per iterazione.")
+    p.add_argument("--seme", type=int, default=0)
+    p.add_argument("-a", type=float, default=PASSO_A, help="Ampiezza dei passi.")
+    p.add_argument("-c", type=float, default=PASSO_C, help="Ampiezza delle perturbazioni (in unità dei pesi predefiniti).")
+    p.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    p.add_argument("--da-capo", action="store_true", help="Ignora il checkpoint esistente.")
+    p.add_argument("--verifica", type=int, default=1000, help="Coppie della sfida finale contro i pesi predefiniti (0 per saltarla).")
+    p.add_argument("--profilo", default=None, help="Salva i pesi trovati con questo nome.")
+    p.add_argument("--processi", type=int, default=None)
+    comandi.add_parser("profili", help="Elenca i profili salvati.")
+    args = parser.parse_args()
+    if args.comando == "profili":
+        profili = ia.carica_profili()
+        if not profili: print(f"Nessun profilo in {ia.PROFILI_FILE}.")
+        for nome, pesi in profili.items(): print(f"{nome}: {_descrivi(pesi)}.")
+    else:
+        stato = None if args.da_capo else carica_checkpoint(args.checkpoint)
+        if stato: print(f"Ripresa da {args.checkpoint}, iterazione {stato['iterazione']}.")
+        else: stato = _stato_iniziale(args.seme, args.coppie, args.a, args.c, args.iterazioni)
+        processi = args.processi or os.cpu_count() or 1
+        with ProcessPoolExecutor(processi) as pool:
+            stato = spsa(stato, args.iterazioni, pool, processi, args.checkpoint)
+            pesi = pesi_da_theta(stato["theta"]); informazioni = {"iterazioni": stato["iterazione"]}
+            if args.verifica:
+                semi = range(SEME_VERIFICA + stato["seme"], SEME_VERIFICA + stato["seme"] + args.verifica)
+                punteggio = confronta_pesi(pesi, ia.PESI_MAESTRO, semi, pool, processi)
+                informazioni.update(punteggio=punteggio, elo=elo_da_punteggio(punteggio), coppie_verifica=args.verifica)
+                print(f"Contro i pesi predefiniti: {punteggio:.1%} su {args.verifica} coppie (Elo {elo_da_punteggio(punteggio):+.0f}).")
+        if args.profilo:
+            ia.salva_profilo(args.profilo, pesi, **informazioni)
+            print(f"Profilo {args.profilo} salvato in {ia.PROFILI_FILE}.")
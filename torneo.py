@@ -0,0 +1,151 @@
+# GABRYSCOLA - Torneo fra varianti di IA
+# Ogni coppia di varianti gioca smazzate specchiate: lo stesso mescolamento due volte, a posti scambiati, così la
+# fortuna delle carte si annulla. Le coppie di partite si distribuiscono su tutti i core; per ogni incontro si
+# aggiornano in diretta Elo con intervallo al 95% e il rapporto di verosimiglianza del test sequenziale (SPRT),
+# che ferma l'incontro appena il risultato è deciso: H1 = A più forte di almeno elo1, H0 = non più di elo0.
+# Uso: python torneo.py finale maestro [casuale ...] [--elo0 0] [--elo1 20] [--alfa 0.05] [--beta 0.05]
+#      [--max-coppie 5000] [--seme 0] [--processi P] [-o torneo.json]
+
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import combinations
+
+from autogioco import gioca_partita_silenziosa, nomi_politiche, trova_politica
+
+ELO0, ELO1 = 0.0, 20.0
+ALFA = BETA = 0.05
+MAX_COPPIE = 5000
+COPPIE_PER_LAVORO = 20
+
+def _esito(punti): return 1.0 if punti > 60 else 0.5 if punti == 60 else 0.0
+
+def gioca_coppia_specchiata(seme, nome_a, nome_b):
+    return punteggio_specchiato(seme, trova_politica(nome_a), trova_politica(nome_b))
+
+def punteggio_specchiato(seme, politica_a, politica_b):
+    """Punteggio di A (da 0 a 2, a mezzi punti) sulle due partite della smazzata del seme: nella seconda B siede
+    al posto di A, con le sue carte e lo stesso turno di mano."""
+    a_di_mano = seme % 2 == 0
+    punti_a, _ = gioca_partita_silenziosa(seme, politica_a, politica_b, a_di_mano)
+    _, punti_a_specchio = gioca_partita_silenziosa(seme, politica_b, politica_a, a_di_mano)
+    return _esito(punti_a) + _esito(punti_a_specchio)
+
+def _gioca_lavoro(args):
+    semi, nome_a, nome_b = args
+    return [gioca_coppia_specchiata(seme, nome_a, nome_b) for seme in semi]
+
+def punteggio_atteso(elo): return 1 / (1 + 10 ** (-elo / 400))
+
+def elo_da_punteggio(p):
+    p = min(max(p, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / p - 1)
+
+class Incontro:
+    """Statistiche di A contro B sulle coppie specchiate (pentanomiale: conteggi dei punteggi 0, 0.5, 1, 1.5, 2)."""
+
+    def __init__(self, nome_a, nome_b, elo0=ELO0, elo1=ELO1, alfa=ALFA, beta=BETA, max_coppie=MAX_COPPIE):
+        self.nome_a, self.nome_b = nome_a, nome_b; self.elo0, self.elo1 = elo0, elo1
+        self.limite_basso = math.log(beta / (1 - alfa)); self.limite_alto = math.log((1 - beta) / alfa)
+        self.max_coppie = max_coppie; self.conteggi = [0] * 5; self.assegnate = 0; self.esito = None
+
+    @property
+    def coppie(self): return sum(self.conteggi)
+
+    def aggiungi(self, punteggi):
+        if self.esito: return # Lavori ancora in volo quando l'incontro era già deciso
+        for p in punteggi: self.conteggi[int(p * 2)] += 1
+        llr = self.llr()
+        if llr >= self.limite_alto: self.esito = "H1"
+        elif llr <= self.limite_basso: self.esito = "H0"
+        elif self.coppie >= self.max_coppie: self.esito = "limite"
+
+    def media_varianza(self):
+        """Media e varianza del punteggio per coppia, riportato fra 0 e 1."""
+        n = self.coppie
+        if not n: return 0.5, 0.0
+        media = sum(i / 4 * k for i, k in enumerate(self.conteggi)) / n
+        return media, sum((i / 4 - media) ** 2 * k for i, k in enumerate(self.conteggi)) / n
+
+    def llr(self):
+        """Log-rapporto di verosimiglianza H1/H0 nell'approssimazione normale (GSPRT)."""
+        media, varianza = self.media_varianza()
+        if varianza <= 0: return 0.0
+        s0, s1 = punteggio_atteso(self.elo0), punteggio_atteso(self.elo1)
+        return self.coppie * (s1 - s0) * (2 * media - s0 - s1) / (2 * varianza)
+
+    def elo(self):
+        """(Elo di A su B, limite basso, limite alto) al 95%."""
+        media, varianza = self.media_varianza(); errore = 1.96 * math.sqrt(varianza / self.coppie) if self.coppie else 0.5
+        return elo_da_punteggio(media), elo_da_punteggio(media - errore), elo_da_punteggio(media + errore)
+
+    def descrizione(self):
+        elo, basso, alto = self.elo(); media, _ = self.media_varianza()
+        esiti = {"H1": f"{self.nome_a} più forte", "H0": f"{self.nome_a} non più forte di {self.elo1:.0f} Elo", "limite": "non deciso (limite di coppie)"}
+        stato = esiti.get(self.esito, "in corso")
+        return (f"{self.nome_a} contro {self.nome_b}: {self.coppie} coppie, punteggio {media:.1%}, Elo {elo:+.0f} ({basso:+.0f} {alto:+.0f}), "
+                f"LLR {self.llr():.2f} su {self.limite_basso:.2f} {self.limite_alto:.2f}: {stato}.")
+
+    def riepilogo(self):
+        elo, basso, alto = self.elo(); media, _ = self.media_varianza()
+        return {"a": self.nome_a, "b": self.nome_b, "coppie": self.coppie, "pentanomiale": self.conteggi, "punteggio": media,
+                "elo": elo, "elo_basso": basso, "elo_alto": alto, "llr": self.llr(), "esito": self.esito}
+
+def elo_complessivo(incontri, varianti, iterazioni=500):
+    """Elo di ogni variante rispetto alla prima (modello di Bradley-Terry sui punti di tutte le partite)."""
+    punti = {v: 0.0 for v in varianti}; partite = {}
+    for inc in incontri:
+        n = inc.coppie * 2; punti_a = sum(i / 2 * k for i, k in enumerate(inc.conteggi))
+        punti[inc.nome_a] += punti_a; punti[inc.nome_b] += n - punti_a
+        partite[inc.nome_a, inc.nome_b] = partite[inc.nome_b, inc.nome_a] = n
+    forza = {v: 1.0 for v in varianti}
+    for _ in range(iterazioni):
+        for v in varianti:
+            denominatore = sum(n / (forza[v] + forza[w]) for (u, w), n in partite.items() if u == v)
+            if denominatore: forza[v] = max(punti[v], 0.5) / denominatore # Mezzo punto minimo: niente forza nulla
+    return {v: 400 * math.log10(forza[v] / forza[varianti[0]]) for v in varianti}
+
+def torneo(varianti, seme=0, processi=None, stampa=print, **parametri):
+    """Tutti contro tutti sulle stesse smazzate; restituisce gli incontri con le loro statistiche."""
+    incontri = [Incontro(a, b, **parametri) for a, b in combinations(varianti, 2)]
+    processi = processi or os.cpu_count() or 1; in_volo = {}
+    with ProcessPoolExecutor(processi) as pool:
+        while True:
+            # Si tengono pieni i processi, dando lavoro all'incontro aperto più indietro
+            while len(in_volo) < 2 * processi:
+                aperti = [inc for inc in incontri if not inc.esito and inc.assegnate < inc.max_coppie]
+                if not aperti: break
+                inc = min(aperti, key=lambda i: i.assegnate); quante = min(COPPIE_PER_LAVORO, inc.max_coppie - inc.assegnate)
+                semi = range(seme + inc.assegnate, seme + inc.assegnate + quante); inc.assegnate += quante
+                in_volo[pool.submit(_gioca_lavoro, (semi, inc.nome_a, inc.nome_b))] = inc
+            if not in_volo: break
+            fatti, _ = wait(in_volo, return_when=FIRST_COMPLETED)
+            for futuro in fatti:
+                inc = in_volo.pop(futuro); deciso = inc.esito; inc.aggiungi(futuro.result())
+                if not deciso: stampa(inc.descrizione())
+    return incontri
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Torneo Gabryscola fra varianti di IA, con smazzate specchiate e SPRT.")
+    parser.add_argument("varianti", nargs="+", choices=nomi_politiche(), metavar="VARIANTE", help=f"Almeno due fra: {', '.join(nomi_politiche())}.")
+    parser.add_argument("--elo0", type=float, default=ELO0)
+    parser.add_argument("--elo1", type=float, default=ELO1)
+    parser.add_argument("--alfa", type=float, default=ALFA)
+    parser.add_argument("--beta", type=float, default=BETA)
+    parser.add_argument("--max-coppie", type=int, default=MAX_COPPIE, help="Coppie specchiate al massimo per incontro.")
+    parser.add_argument("--seme", type=int, default=0)
+    parser.add_argument("--processi", type=int, default=None)
+    parser.add_argument("-o", "--output", default=None, help="File JSON con i risultati.")
+    args = parser.parse_args()
+    varianti = list(dict.fromkeys(args.varianti))
+    if len(varianti) < 2: parser.error("servono almeno due varianti diverse.")
+    incontri = torneo(varianti, args.seme, args.processi, elo0=args.elo0, elo1=args.elo1, alfa=args.alfa, beta=args.beta, max_coppie=args.max_coppie)
+    print("\nRisultati:")
+    for inc in incontri: print(inc.descrizione())
+    elo = elo_complessivo(incontri, varianti)
+    print(f"\nClassifica (Elo rispetto a {varianti[0]}):")
+    for i, v in enumerate(sorted(varianti, key=elo.get, reverse=True), 1): print(f"{i}. {v} {elo[v]:+.0f}")
+    if args.output:
+        with open(args.output, 'w') as f: json.dump({"incontri": [inc.riepilogo() for inc in incontri], "elo": elo}, f, indent=4)
@@ -0,0 +1,88 @@
+# GABRYSCOLA - Valutazione vettoriale delle aperture con NumPy
+# Calcola in un colpo solo il valore di apertura di ogni carta della mano contro tutte le incognite,
+# per molti stati di gioco insieme. Dà gli stessi valori di ia.valuta_aperture.
+# NumPy è facoltativo: senza, DISPONIBILE è False e si resta su ia.scelta_maestro.
+# Uso: python valutatore_np.py [-n PARTITE] per il confronto con l'euristica su un corpus di partite.
+
+import argparse
+
+from motore import NUM_CARTE, NESSUNA, PUNTI, VINCE_PRIMA, StatoPartita
+import ia
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+DISPONIBILE = np is not None
+
+if DISPONIBILE:
+    _VINCE = np.array(VINCE_PRIMA, dtype=bool).reshape(4, NUM_CARTE, NUM_CARTE) # [briscola, carta di mano, risposta]
+    _PUNTI = np.array(PUNTI, dtype=np.int64)
+    _PUNTI_PRESA = _PUNTI[:, None] + _PUNTI[None, :]
+    _SALDO = np.where(_VINCE, _PUNTI_PRESA, -_PUNTI_PRESA) # Punti guadagnati (+) o ceduti (-) da chi apre
+    _SEME = np.arange(NUM_CARTE) // 10
+    _DI_SEME = _SEME[None, :] == np.arange(4)[:, None] # [seme, carta]
+    _SPOSTAMENTI = np.arange(NUM_CARTE, dtype=np.uint64)
+
+def maschere_in_matrice(maschere):
+    """Da S maschere a 40 bit a una matrice S x 40 di 0/1."""
+    m = np.asarray(maschere, dtype=np.uint64)
+    return ((m[:, None] >> _SPOSTAMENTI) & np.uint64(1)).astype(np.int64)
+
+def valuta_aperture(mani, semi_briscola, incognite, carte_nel_mazzo, pesi=ia.PESI_MAESTRO):
+    """Valori di apertura per S stati. mani è S x 3 con NESSUNA nei posti vuoti, gli altri argomenti hanno lunghezza S.
+    Restituisce una matrice S x 3 di float64 con -inf nei posti vuoti."""
+    mani = np.asarray(mani, dtype=np.int64); b = np.asarray(semi_briscola, dtype=np.int64)
+    nel_mazzo = np.asarray(carte_nel_mazzo, dtype=np.int64)[:, None]
+    valide = mani != NESSUNA; h = np.where(valide, mani, 0); bb = b[:, None]
+    u = maschere_in_matrice(incognite)
+    n = u.sum(axis=1)[:, None]; ci_sono = n > 0; nn = np.where(ci_sono, n, 1)
+    briscole_incognite = (u * _DI_SEME[b]).sum(axis=1)[:, None]
+    atteso = (_SALDO[bb, h] * u[:, None, :]).sum(axis=2)
+    vittorie = (_VINCE[bb, h] * u[:, None, :]).sum(axis=2)
+    p = _PUNTI[h]; is_briscola = _SEME[h] == bb
+    # Stesso ordine delle operazioni di ia.valuta_aperture, per avere valori identici bit per bit
+    valore_medio = np.where(ci_sono, atteso / nn, p)
+    prob_vittoria = np.where(ci_sono, vittorie / nn, 1.0)
+    rischio = np.where((p > 0) & ~is_briscola & ci_sono, briscole_incognite / nn * p * pesi.rischio, 0.0)
+    costo_opportunita = np.where(is_briscola & (p > 3), (p + pesi.base_opportunita) * (nel_mazzo / pesi.scala_opportunita), 0.0)
+    valore_tattico = (1 - prob_vittoria) * pesi.vantaggio_mano - prob_vittoria * pesi.vantaggio_mano
+    valori = valore_medio - rischio - costo_opportunita + valore_tattico
+    return np.where(valide, valori, -np.inf)
+
+def scelte_aperture(mani, semi_briscola, incognite, carte_nel_mazzo, pesi=ia.PESI_MAESTRO):
+    """Carta scelta per ciascuno degli S stati; a parità vince la prima, come in ia.scelta_maestro."""
+    mani = np.asarray(mani, dtype=np.int64)
+    indici = valuta_aperture(mani, semi_briscola, incognite, carte_nel_mazzo, pesi).argmax(axis=1)
+    return mani[np.arange(len(mani)), indici]
+
+def stati_di_apertura(semi):
+    """Raccoglie (mano, briscola, incognite, carte_nel_mazzo) di ogni apertura in partite maestro contro maestro."""
+    from autogioco import ordine_mescolato
+    for seme in semi:
+        stato = StatoPartita(ordine_mescolato(seme), seme % 2)
+        while not stato.finita:
+            g = stato.turno
+            if stato.tavolo == NESSUNA:
+                yield stato.mosse(), stato.briscola, ia.incognite_per(stato, g), stato.carte_nel_mazzo()
+            stato.giocata(ia.politica_maestro(stato, g))
+
+def verifica(partite=2000, seme=0, pesi=ia.PESI_MAESTRO):
+    """Confronta valori e scelte con ia.valuta_aperture; restituisce (stati confrontati, differenze)."""
+    stati = list(stati_di_apertura(range(seme, seme + partite)))
+    mani = [m + [NESSUNA] * (3 - len(m)) for m, _, _, _ in stati]
+    valori = valuta_aperture(mani, [s[1] for s in stati], [s[2] for s in stati], [s[3] for s in stati], pesi)
+    differenze = 0
+    for riga, (mano, briscola, incognite, nel_mazzo) in zip(valori, stati):
+        attesi = ia.valuta_aperture(mano, briscola, incognite, nel_mazzo, pesi)
+        if list(riga[:len(mano)]) != attesi: differenze += 1
+    return len(stati), differenze
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confronto del valutatore NumPy con l'euristica maestro.")
+    parser.add_argument("-n", "--partite", type=int, default=2000)
+    parser.add_argument("--seme", type=int, default=0)
+    args = parser.parse_args()
+    if not DISPONIBILE: raise SystemExit("NumPy non è installato.")
+    confrontati, differenze = verifica(args.partite, args.seme)
+    print(f"Stati di apertura confrontati: {confrontati}. Differenze: {differenze}.")